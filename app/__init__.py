@@ -1,4 +1,3 @@
 
-from . import session
-from . import bot
-from . import beatmaps
+# Submodules are imported explicitly, so that e.g. pp workers & benchmarks
+# can import helpers without setting up a full bot session
@@ -1,6 +1,9 @@
 
-from .common import pack_beatmap, parse_beatmap, delete_beatmapset, delete_beatmap, apply_beatmap_patches
+from .patches import pack_beatmap, parse_beatmap, apply_beatmap_patches
+from .common import delete_beatmapset, delete_beatmap, remove_beatmap_files, store_imported_beatmapset
 from .curves import convert_perfect_curves
 from .decimals import fix_beatmap_decimal_values
 from .leadin import fix_beatmap_lead_in
-from .ossapi import store_ossapi_beatmapset, fetch_osz_filesizes
+from .ossapi import store_ossapi_beatmapset, fetch_osz_filesizes, resolve_beatmap_filename
+from .osz import rebuild_osz, update_osz_beatmaps
+from .transfer import upload_osz_stream, transfer_osz
@@ -1,82 +1,149 @@
 
-from app.common.database.objects import DBBeatmapset, DBBeatmap
+from app.common.database.objects import (
+    DBBeatmapCollaborationRequest,
+    DBBeatmapCollaboration,
+    DBBeatmapNomination,
+    DBBeatmapModding,
+    DBBeatmapset,
+    DBFavourite,
+    DBBeatmap,
+    DBRating,
+    DBScore,
+    DBPlay
+)
 from app.common.database.repositories import wrapper
 from app.common.database.repositories import *
-from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import Delete, select, delete, update
+from typing import Any, Dict, Iterable, Iterator, List
+from contextlib import contextmanager
+from .ossapi import store_ossapi_beatmapset
 from sqlalchemy.orm import Session
-from slider import Beatmap
 
-import app.beatmaps as beatmap_helper
+import asyncio
 import app
 
-def parse_beatmap(content: bytes, beatmap_id: int) -> Beatmap | None:
-    try:
-        decoded_content = content.decode("utf-8-sig")
-        return Beatmap.parse(decoded_content)
-    except Exception as error:
-        app.session.logger.warning(
-            f"Invalid beatmap file for '{beatmap_id}': {error}",
-            exc_info=True
-        )
-        return None
-
-def pack_beatmap(beatmap: Beatmap) -> bytes:
-    return beatmap.pack().encode("utf-8")
-
-def round_half_up(value: float) -> int:
-    return int(Decimal(str(value)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+RemoveBatchSize = 1000
 
 @wrapper.session_wrapper
 def delete_beatmapset(beatmapset: DBBeatmapset, session: Session = wrapper.SessionProvider) -> None:
-    app.session.storage.remove_osz2(beatmapset.id)
-    app.session.storage.remove_osz(beatmapset.id)
-    app.session.storage.remove_background(beatmapset.id)
-    app.session.storage.remove_mp3(beatmapset.id)
-
-    for beatmap in beatmapset.beatmaps:
-        app.session.storage.remove_beatmap_file(beatmap.id)
-
-    # Delete all related data
-    for beatmap in beatmapset.beatmaps:
-        collaborations.delete_requests_by_beatmap(beatmap.id, session=session)
-        collaborations.delete_by_beatmap(beatmap.id, session=session)
-        scores.delete_by_beatmap_id(beatmap.id, session=session)
-
-    modding.delete_by_set_id(beatmapset.id, session=session)
-    ratings.delete_by_set_id(beatmapset.id, session=session)
-    plays.delete_by_set_id(beatmapset.id, session=session)
-    nominations.delete_all(beatmapset.id, session=session)
-    favourites.delete_all(beatmapset.id, session=session)
-    beatmaps.delete_by_set_id(beatmapset.id, session=session)
-    beatmapsets.delete_by_id(beatmapset.id, session=session)
+    """Delete a beatmapset and all rows that depend on it, inside of one transaction"""
+    beatmap_ids = select(DBBeatmap.id).where(DBBeatmap.set_id == beatmapset.id)
+
+    # Every table is cleared with one statement, no matter how many beatmaps there are
+    statements = (
+        delete(DBBeatmapCollaborationRequest).where(DBBeatmapCollaborationRequest.beatmap_id.in_(beatmap_ids)),
+        delete(DBBeatmapCollaboration).where(DBBeatmapCollaboration.beatmap_id.in_(beatmap_ids)),
+        delete(DBScore).where(DBScore.beatmap_id.in_(beatmap_ids)),
+        delete(DBBeatmapModding).where(DBBeatmapModding.set_id == beatmapset.id),
+        delete(DBRating).where(DBRating.set_id == beatmapset.id),
+        delete(DBPlay).where(DBPlay.set_id == beatmapset.id),
+        delete(DBBeatmapNomination).where(DBBeatmapNomination.set_id == beatmapset.id),
+        delete(DBFavourite).where(DBFavourite.set_id == beatmapset.id),
+        delete(DBBeatmap).where(DBBeatmap.set_id == beatmapset.id),
+        delete(DBBeatmapset).where(DBBeatmapset.id == beatmapset.id)
+    )
+    execute_deletes(statements, session)
 
 @wrapper.session_wrapper
 def delete_beatmap(beatmap: DBBeatmap, session: Session = wrapper.SessionProvider) -> None:
-    app.session.storage.remove_beatmap_file(beatmap.id)
-
-    collaborations.delete_requests_by_beatmap(beatmap.id, session=session)
-    collaborations.delete_by_beatmap(beatmap.id, session=session)
-    ratings.delete_by_beatmap_hash(beatmap.md5, session=session)
-    plays.delete_by_beatmap_id(beatmap.id, session=session)
-    beatmaps.delete_by_id(beatmap.id, session=session)
-    scores.delete_by_beatmap_id(beatmap.id, session=session)
-
-def apply_beatmap_patches(
-    beatmap: Beatmap,
-    fix_decimal_values: bool = True,
-    fix_leadin_times: bool = True,
-    fix_perfect_curves: bool = True
-) -> tuple[bool, bool, bool]:
-    decimals_fixed = (
-        fix_decimal_values and
-        beatmap_helper.fix_beatmap_decimal_values(beatmap)
-    )
-    leadin_fixed = (
-        fix_leadin_times and
-        beatmap_helper.fix_beatmap_lead_in(beatmap)
+    """Delete a beatmap and all rows that depend on it, inside of one transaction"""
+    statements = (
+        delete(DBBeatmapCollaborationRequest).where(DBBeatmapCollaborationRequest.beatmap_id == beatmap.id),
+        delete(DBBeatmapCollaboration).where(DBBeatmapCollaboration.beatmap_id == beatmap.id),
+        delete(DBRating).where(DBRating.map_checksum == beatmap.md5),
+        delete(DBPlay).where(DBPlay.beatmap_id == beatmap.id),
+        delete(DBScore).where(DBScore.beatmap_id == beatmap.id),
+        delete(DBBeatmap).where(DBBeatmap.id == beatmap.id)
     )
-    perfect_curves_fixed = (
-        fix_perfect_curves and
-        beatmap_helper.convert_perfect_curves(beatmap)
-    )
-    return decimals_fixed, leadin_fixed, perfect_curves_fixed
+    execute_deletes(statements, session)
+
+def execute_deletes(statements: Iterable[Delete], session: Session) -> None:
+    try:
+        for statement in statements:
+            session.execute(statement.execution_options(synchronize_session=False))
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+async def remove_beatmap_files(beatmapset_id: int | None, beatmap_ids: List[int]) -> None:
+    """Remove the files of a beatmapset and/or its beatmaps from storage, concurrently"""
+    storage = app.session.storage
+    run = app.session.executors.io.run
+    tasks = []
+
+    if beatmapset_id is not None:
+        tasks += [
+            run(storage.remove_osz2, beatmapset_id),
+            run(storage.remove_osz, beatmapset_id),
+            run(storage.remove_background, beatmapset_id),
+            run(storage.remove_mp3, beatmapset_id)
+        ]
+
+    tasks += [
+        run(storage.remove_beatmap_files, beatmap_ids[index:index + RemoveBatchSize])
+        for index in range(0, len(beatmap_ids), RemoveBatchSize)
+    ]
+
+    await asyncio.gather(*tasks)
+
+@contextmanager
+def import_session() -> Iterator[Session]:
+    """Session, whose changes are only committed once the whole block succeeded
+
+    Repository functions may still call `session.commit()` inside of it,
+    which will only release a savepoint of the outer transaction.
+    """
+    with app.session.database.engine.connect() as connection:
+        transaction = connection.begin()
+        session = Session(
+            bind=connection,
+            join_transaction_mode='create_savepoint',
+            expire_on_commit=False
+        )
+
+        try:
+            yield session
+            transaction.commit()
+        except BaseException:
+            transaction.rollback()
+            raise
+        finally:
+            session.close()
+
+def update_imported_beatmapset(
+    set_id: int,
+    beatmapset_updates: dict,
+    beatmap_updates: List[dict],
+    session: Session
+) -> None:
+    """Write all updates of an imported beatmapset, using one bulk UPDATE per table"""
+    if beatmapset_updates:
+        session.execute(
+            update(DBBeatmapset)
+            .where(DBBeatmapset.id == set_id)
+            .values(beatmapset_updates)
+        )
+
+    if beatmap_updates:
+        # Rows are matched by their "id" & sent as an executemany
+        session.execute(update(DBBeatmap), beatmap_updates)
+
+    session.commit()
+
+def store_imported_beatmapset(
+    ossapi_set: Any,
+    filenames: Dict[int, str],
+    beatmapset_updates: dict,
+    beatmap_updates: List[dict]
+) -> DBBeatmapset:
+    """Write a fully prepared import in one short transaction
+
+    This blocks, and is meant to run inside of the database pool, after
+    everything that needs the network has already completed.
+    """
+    with import_session() as session:
+        database_set = store_ossapi_beatmapset(ossapi_set, filenames, session=session)
+        update_imported_beatmapset(database_set.id, beatmapset_updates, beatmap_updates, session)
+        return database_set
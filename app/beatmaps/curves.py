@@ -2,6 +2,8 @@
 from slider.curve import Curve, Perfect
 from slider.position import Position
 from slider import Beatmap, Slider
+
+import numpy as np
 import math
 
 Arc = dict[str, float | tuple[float, float]]
@@ -15,10 +17,36 @@ CirclePresets = [
     (2 * math.pi, [(1.0, 0.0), (1.0, 1.2447058), (-0.8526471, 2.118367), (-2.6211002, 7.854936e-06), (-0.8526448, -2.118357), (1.0, -1.2447058), (1.0, -2.4492937e-16)]),
 ]
 
-def convert_perfect_curves(beatmap: Beatmap) -> bool:
+def convert_perfect_curves(beatmap: Beatmap, vectorized: bool = True) -> bool:
     """Convert all 'P' curves on a beatmap to 'B' curves in-place."""
+    sliders = collect_perfect_sliders(beatmap)
+
+    if not sliders:
+        return False
+
+    points = [slider_points for _, slider_points in sliders]
+    converted_points = (
+        perfect_curves_to_bezier(points) if vectorized else
+        [perfect_curve_to_bezier(*slider_points) for slider_points in points]
+    )
     has_updates = False
 
+    for (hit_object, _), bezier_positions in zip(sliders, converted_points):
+        if bezier_positions is None:
+            continue
+
+        hit_object.curve = Curve.from_kind_and_points(
+            "B",
+            bezier_positions,
+            hit_object.length,
+        )
+        has_updates = True
+
+    return has_updates
+
+def collect_perfect_sliders(beatmap: Beatmap) -> list[tuple[Slider, tuple[Vector2D, Vector2D, Vector2D]]]:
+    sliders = []
+
     for hit_object in beatmap.hit_objects(stacking=False):
         if not isinstance(hit_object, Slider):
             continue
@@ -34,24 +62,115 @@ def convert_perfect_curves(beatmap: Beatmap) -> bool:
         if start_point == middle_point or middle_point == end_point:
             continue
 
-        arc = calculate_circle_properties(start_point, middle_point, end_point)
-        if arc is None:
-            continue
+        sliders.append((hit_object, (start_point, middle_point, end_point)))
 
-        bezier_points = approximate_circle_with_bezier(arc)
-        bezier_positions = [
-            Position(round(point[0]), round(point[1]))
-            for point in bezier_points
-        ]
+    return sliders
 
-        hit_object.curve = Curve.from_kind_and_points(
-            "B",
-            bezier_positions,
-            hit_object.length,
+def perfect_curve_to_bezier(
+    start_point: Vector2D,
+    middle_point: Vector2D,
+    end_point: Vector2D
+) -> list[Position] | None:
+    """Scalar conversion of a single perfect curve, used as a reference for the batched path"""
+    arc = calculate_circle_properties(start_point, middle_point, end_point)
+    if arc is None:
+        return None
+
+    bezier_points = approximate_circle_with_bezier(arc)
+    return [
+        Position(round(point[0]), round(point[1]))
+        for point in bezier_points
+    ]
+
+def perfect_curves_to_bezier(
+    points: list[tuple[Vector2D, Vector2D, Vector2D]]
+) -> list[list[Position] | None]:
+    """Batched conversion of many perfect curves, producing the same output as `perfect_curve_to_bezier`"""
+    coordinates = np.asarray(points, dtype=np.float64)
+    point_a, point_b, point_c = coordinates[:, 0], coordinates[:, 1], coordinates[:, 2]
+    ax, ay = point_a[:, 0], point_a[:, 1]
+    bx, by = point_b[:, 0], point_b[:, 1]
+    cx, cy = point_c[:, 0], point_c[:, 1]
+
+    # Operations are kept in the same order as the scalar path,
+    # to get bit-identical results after rounding
+    determinant = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    valid = np.abs(determinant) >= 1e-10
+    determinant = np.where(valid, determinant, 1.0)
+
+    a_sq = ax ** 2 + ay ** 2
+    b_sq = bx ** 2 + by ** 2
+    c_sq = cx ** 2 + cy ** 2
+
+    center_x = (a_sq * (by - cy) + b_sq * (cy - ay) + c_sq * (ay - by)) / determinant
+    center_y = (a_sq * (cx - bx) + b_sq * (ax - cx) + c_sq * (bx - ax)) / determinant
+
+    delta_ax, delta_ay = ax - center_x, ay - center_y
+    delta_cx, delta_cy = cx - center_x, cy - center_y
+    radius = np.sqrt(delta_ax ** 2 + delta_ay ** 2)
+
+    # Transcendental functions go through libm, since numpy's
+    # implementations are not guaranteed to round the same way
+    theta_start = np.array(list(map(math.atan2, delta_ay.tolist(), delta_ax.tolist())))
+    theta_end = np.array(list(map(math.atan2, delta_cy.tolist(), delta_cx.tolist())))
+    theta_end = np.where(theta_end < theta_start, theta_end + 2 * math.pi, theta_end)
+    theta_range = theta_end - theta_start
+
+    ortho_dot = (cy - ay) * (bx - ax) + (ax - cx) * (by - ay)
+    clockwise = ortho_dot < 0
+    theta_range = np.where(clockwise, 2 * math.pi - theta_range, theta_range)
+
+    cos_start = np.array(list(map(math.cos, theta_start.tolist())))
+    sin_start = np.array(list(map(math.sin, theta_start.tolist())))
+
+    preset_lengths = np.array([preset[0] for preset in CirclePresets])
+    preset_indices = np.minimum(
+        np.searchsorted(preset_lengths, theta_range, side='left'),
+        len(CirclePresets) - 1
+    )
+
+    results: list[list[Position] | None] = [None] * len(points)
+
+    for preset_index, (preset_arc_length, preset_points) in enumerate(CirclePresets):
+        indices = np.nonzero(valid & (preset_indices == preset_index))[0]
+
+        if not len(indices):
+            continue
+
+        bezier_arc = np.repeat(
+            np.asarray(preset_points, dtype=np.float64)[np.newaxis],
+            len(indices), axis=0
+        )
+        curve_order = len(preset_points) - 1
+        interpolation_factor = (theta_range[indices] / preset_arc_length)[:, np.newaxis]
+
+        for order in range(curve_order):
+            for index in range(curve_order, order, -1):
+                bezier_arc[:, index] = (
+                    bezier_arc[:, index] * interpolation_factor
+                    + bezier_arc[:, index - 1] * (1 - interpolation_factor)
+                )
+
+        scaled = bezier_arc * radius[indices, np.newaxis, np.newaxis]
+        scaled[:, :, 1] = np.where(
+            clockwise[indices, np.newaxis],
+            -scaled[:, :, 1],
+            scaled[:, :, 1]
         )
-        has_updates = True
 
-    return has_updates
+        cos_group = cos_start[indices, np.newaxis]
+        sin_group = sin_start[indices, np.newaxis]
+        final_x = (scaled[:, :, 0] * cos_group - scaled[:, :, 1] * sin_group) + center_x[indices, np.newaxis]
+        final_y = (scaled[:, :, 0] * sin_group + scaled[:, :, 1] * cos_group) + center_y[indices, np.newaxis]
+
+        # np.rint rounds half to even, just like round()
+        rounded_x = np.rint(final_x).astype(np.int64).tolist()
+        rounded_y = np.rint(final_y).astype(np.int64).tolist()
+
+        for result_index, xs, ys in zip(indices.tolist(), rounded_x, rounded_y):
+            results[result_index] = list(map(Position, xs, ys))
+
+    return results
 
 def calculate_circle_properties(
     point_a: Vector2D,
@@ -1,8 +1,11 @@
 
-from .common import round_half_up
+from decimal import Decimal, ROUND_HALF_UP
 from typing import Callable
 from slider import Beatmap
 
+def round_half_up(value: float) -> int:
+    return int(Decimal(str(value)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
 def fix_beatmap_decimal_values(beatmap: Beatmap, rounding_method: Callable[[float], int] = round_half_up) -> bool:
     """Round OD/AR/HP/CS values on a parsed beatmap in-place."""
     has_updates = False
@@ -4,14 +4,19 @@ from app.common.database.repositories import wrapper
 from app.common.database.repositories import *
 from sqlalchemy.orm import Session
 from ossapi import Beatmapset
-from typing import Tuple
+from typing import Tuple, Dict
 
 import hashlib
+import asyncio
 import app
 import re
 
 @wrapper.session_wrapper
-def store_ossapi_beatmapset(set: Beatmapset, session: Session = wrapper.SessionProvider) -> DBBeatmapset:
+def store_ossapi_beatmapset(
+    set: Beatmapset,
+    filenames: Dict[int, str],
+    session: Session = wrapper.SessionProvider
+) -> DBBeatmapset:
     """Convert an osu! api beatmapset to a local beatmapset and store it in the database"""
     database_set: DBBeatmapset = beatmapsets.create(
         set.id,
@@ -38,7 +43,7 @@ def store_ossapi_beatmapset(set: Beatmapset, session: Session = wrapper.SessionP
             beatmap.id, beatmap.beatmapset_id,
             beatmap.mode_int, beatmap.checksum,
             beatmap.status.value, beatmap.version,
-            resolve_beatmap_filename(beatmap.id),
+            filenames[beatmap.id],
             beatmap.total_length, beatmap.max_combo or 0,
             beatmap.bpm, beatmap.cs,
             beatmap.ar, beatmap.accuracy,
@@ -50,9 +55,12 @@ def store_ossapi_beatmapset(set: Beatmapset, session: Session = wrapper.SessionP
 
     return database_set
 
-def resolve_beatmap_filename(id: int) -> str:
+async def resolve_beatmap_filename(id: int) -> str:
     """Fetch the filename of a beatmap"""
-    response = app.session.requests.head(f'https://osu.ppy.sh/osu/{id}')
+    response = await app.session.http.head(
+        f'https://osu.ppy.sh/osu/{id}',
+        allow_redirects=False
+    )
     response.raise_for_status()
 
     if not (cd := response.headers.get('content-disposition')):
@@ -60,14 +68,15 @@ def resolve_beatmap_filename(id: int) -> str:
 
     return re.findall("filename=(.+)", cd)[0].strip('"')
 
-def fetch_osz_filesizes(set_id: int) -> Tuple[int, int]:
+async def fetch_osz_filesizes(set_id: int) -> Tuple[int, int]:
     """Fetch the filesize of a beatmapset's .osz file from a mirror"""
-    filesize, filesize_novideo = 0, 0
-
-    if (response := app.session.beatmaps.api.osz_response(set_id, no_video=False)):
-        filesize = int(response.headers.get('Content-Length', default=0))
-
-    if (response := app.session.beatmaps.api.osz_response(set_id, no_video=True)):
-        filesize_novideo = int(response.headers.get('Content-Length', default=0))
+    # The mirror api is blocking, but both requests can run at the same time
+    responses = await asyncio.gather(
+        app.session.executors.io.run(app.session.beatmaps.api.osz_response, set_id, no_video=False),
+        app.session.executors.io.run(app.session.beatmaps.api.osz_response, set_id, no_video=True)
+    )
 
-    return filesize, filesize_novideo
+    return tuple(
+        int(response.headers.get('Content-Length', default=0)) if response else 0
+        for response in responses
+    )
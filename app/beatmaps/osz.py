@@ -0,0 +1,122 @@
+
+from typing import BinaryIO, Iterable, Tuple
+from .transfer import upload_osz_stream
+
+import tempfile
+import zipfile
+import app
+import io
+import shutil
+import struct
+import stat
+import sys
+
+# (filename, date_time, content)
+BeatmapFile = Tuple[str, Tuple[int, int, int, int, int, int], bytes]
+
+LocalFileHeader = struct.Struct('<4s5H3L2H')
+LocalFileHeaderSignature = b'PK\x03\x04'
+DataDescriptorFlag = 0x08
+CopyChunkSize = 1024 * 1024
+SupportedCompressions = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+# copy_member_raw writes through private zipfile internals, which were only
+# verified for these python versions, everything else gets recompressed
+RawCopyVersions = ((3, 10), (3, 11), (3, 12), (3, 13))
+RawCopyAttributes = ('_lock', '_writecheck', '_didModify', 'start_dir', 'fp', 'filelist', 'NameToInfo')
+
+def update_osz_beatmaps(set_id: int, osz_file: bytes, beatmap_files: Iterable[BeatmapFile]) -> None:
+    """Rebuild an .osz with new .osu files and stream the result to storage"""
+    spool_size = app.session.settings.OSZ_SPOOL_SIZE
+
+    # Larger archives are spooled to disk, instead of being kept in memory
+    with tempfile.SpooledTemporaryFile(max_size=spool_size) as buffer:
+        rebuild_osz(io.BytesIO(osz_file), beatmap_files, buffer)
+        buffer.seek(0)
+        upload_osz_stream(set_id, buffer)
+
+def rebuild_osz(source: BinaryIO, beatmap_files: Iterable[BeatmapFile], target: BinaryIO) -> None:
+    """Replace the .osu files of an .osz, copying every other member without recompressing it"""
+    with zipfile.ZipFile(source, 'r') as osz_read, \
+         zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as osz_write:
+        # Write new .osu files
+        for filename, date_time, content in beatmap_files:
+            zip_info = zipfile.ZipInfo(filename=filename, date_time=date_time)
+            zip_info.compress_type = zipfile.ZIP_DEFLATED
+            zip_info.external_attr = (stat.S_IFREG | 0o664) << 16
+            osz_write.writestr(zip_info, content)
+
+        raw_copy = raw_copy_supported(osz_read, osz_write)
+
+        # Copy over other files (backgrounds, audio, etc...)
+        for item in osz_read.infolist():
+            if item.filename.endswith('.osu'):
+                continue
+
+            if item.compress_type not in SupportedCompressions or not raw_copy:
+                # The game can only read stored or deflated files
+                recompress_member(osz_read, item, osz_write)
+                continue
+
+            copy_member_raw(osz_read, item, osz_write)
+
+def raw_copy_supported(source: zipfile.ZipFile, target: zipfile.ZipFile) -> bool:
+    if sys.version_info[:2] not in RawCopyVersions:
+        return False
+
+    return all(
+        hasattr(archive, attribute)
+        for archive in (source, target)
+        for attribute in RawCopyAttributes
+    )
+
+def recompress_member(source: zipfile.ZipFile, item: zipfile.ZipInfo, target: zipfile.ZipFile) -> None:
+    zip_info = zipfile.ZipInfo(filename=item.filename, date_time=item.date_time)
+    zip_info.compress_type = zipfile.ZIP_DEFLATED
+    zip_info.external_attr = (stat.S_IFREG | 0o664) << 16
+    zip_info.file_size = item.file_size
+
+    with source.open(item, 'r') as source_file, target.open(zip_info, 'w') as target_file:
+        shutil.copyfileobj(source_file, target_file, CopyChunkSize)
+
+def copy_member_raw(source: zipfile.ZipFile, item: zipfile.ZipInfo, target: zipfile.ZipFile) -> None:
+    """Copy the compressed bytes of a zip member as they are, in constant memory"""
+    zip_info = zipfile.ZipInfo(filename=item.filename, date_time=item.date_time)
+    zip_info.compress_type = item.compress_type
+    zip_info.flag_bits = item.flag_bits & ~DataDescriptorFlag
+    zip_info.external_attr = (stat.S_IFREG | 0o664) << 16
+    zip_info.CRC = item.CRC
+    zip_info.compress_size = item.compress_size
+    zip_info.file_size = item.file_size
+    zip64 = max(item.compress_size, item.file_size) > zipfile.ZIP64_LIMIT
+
+    with source._lock, target._lock:
+        source.fp.seek(item.header_offset)
+        header = LocalFileHeader.unpack(source.fp.read(LocalFileHeader.size))
+
+        if header[0] != LocalFileHeaderSignature:
+            raise zipfile.BadZipFile(f'Bad local file header for "{item.filename}"')
+
+        # Skip filename & extra field of the local header
+        source.fp.seek(header[9] + header[10], 1)
+
+        target._writecheck(zip_info)
+        target._didModify = True
+        target.fp.seek(target.start_dir)
+        zip_info.header_offset = target.fp.tell()
+        target.fp.write(zip_info.FileHeader(zip64))
+
+        remaining = item.compress_size
+
+        while remaining > 0:
+            chunk = source.fp.read(min(CopyChunkSize, remaining))
+
+            if not chunk:
+                raise zipfile.BadZipFile(f'Truncated data for "{item.filename}"')
+
+            target.fp.write(chunk)
+            remaining -= len(chunk)
+
+        target.start_dir = target.fp.tell()
+        target.filelist.append(zip_info)
+        target.NameToInfo[zip_info.filename] = zip_info
@@ -0,0 +1,44 @@
+
+from .decimals import fix_beatmap_decimal_values
+from .curves import convert_perfect_curves
+from .leadin import fix_beatmap_lead_in
+from slider import Beatmap
+
+import logging
+
+# Pure helpers of the patch pipeline, that don't need a bot session
+logger = logging.getLogger('banchobot')
+
+def parse_beatmap(content: bytes, beatmap_id: int) -> Beatmap | None:
+    try:
+        decoded_content = content.decode("utf-8-sig")
+        return Beatmap.parse(decoded_content)
+    except Exception as error:
+        logger.warning(
+            f"Invalid beatmap file for '{beatmap_id}': {error}",
+            exc_info=True
+        )
+        return None
+
+def pack_beatmap(beatmap: Beatmap) -> bytes:
+    return beatmap.pack().encode("utf-8")
+
+def apply_beatmap_patches(
+    beatmap: Beatmap,
+    fix_decimal_values: bool = True,
+    fix_leadin_times: bool = True,
+    fix_perfect_curves: bool = True
+) -> tuple[bool, bool, bool]:
+    decimals_fixed = (
+        fix_decimal_values and
+        fix_beatmap_decimal_values(beatmap)
+    )
+    leadin_fixed = (
+        fix_leadin_times and
+        fix_beatmap_lead_in(beatmap)
+    )
+    perfect_curves_fixed = (
+        fix_perfect_curves and
+        convert_perfect_curves(beatmap)
+    )
+    return decimals_fixed, leadin_fixed, perfect_curves_fixed
@@ -0,0 +1,52 @@
+
+from typing import BinaryIO, Iterable, Tuple
+
+import hashlib
+import app
+import io
+
+class ChunkedReader(io.RawIOBase):
+    """Non-seekable file object over an iterator of chunks, which tracks size & checksum on the fly"""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+        self.checksum = hashlib.md5()
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        # Always fill the buffer up to the requested size, since
+        # multipart uploads can't handle short reads
+        while size < 0 or len(self.buffer) < size:
+            if (chunk := next(self.chunks, None)) is None:
+                break
+
+            self.size += len(chunk)
+            self.checksum.update(chunk)
+            self.buffer += chunk
+
+        if size < 0 or size >= len(self.buffer):
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            return data
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def transfer_osz(set_id: int, chunks: Iterable[bytes]) -> Tuple[int, str]:
+    """Upload an .osz while it is being downloaded, returning its size & md5 checksum"""
+    reader = ChunkedReader(chunks)
+    upload_osz_stream(set_id, reader)
+    return reader.size, reader.checksum.hexdigest()
+
+def upload_osz_stream(set_id: int, stream: BinaryIO) -> None:
+    app.session.storage.upload_osz_stream(set_id, stream)
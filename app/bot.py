@@ -1,18 +1,63 @@
 from discord.ext.commands import *
+from discord.ext.commands.hybrid import HybridAppCommand
+from discord import Interaction, app_commands
 from app.extensions import *
 
 import discord
-import app
+import asyncio
+import time
+import app.session
+import app.metrics
 
 class BanchoBot(Bot):
+    index_task: asyncio.Task | None = None
+
     async def on_ready(self):
         app.session.logger.info(f'Logged in as {self.user}.')
         app.session.filters.populate()
         await self.load_cogs()
+        app.session.subscriptions.start()
+
+        # on_ready fires again after reconnects, which shouldn't start another build
+        if self.index_task is None or self.index_task.done():
+            self.index_task = asyncio.create_task(
+                app.session.beatmap_index.run(app.session.settings.BEATMAP_INDEX_INTERVAL)
+            )
+
+        if app.session.settings.METRICS_PORT:
+            await app.session.metrics_server.start()
+
+    async def on_app_command_completion(
+        self,
+        interaction: Interaction,
+        command: app_commands.Command | app_commands.ContextMenu
+    ) -> None:
+        if isinstance(command, HybridAppCommand):
+            # Hybrid commands are recorded by the cog's after-invoke hook
+            return
+
+        if (started_at := interaction.extras.get('started_at')) is None:
+            return
+
+        app.metrics.command_duration.observe(
+            time.perf_counter() - started_at,
+            command.qualified_name
+        )
+
+        if (queries := interaction.extras.get('queries')) is not None:
+            app.metrics.command_queries.observe(queries.count, command.qualified_name)
 
     async def close(self):
+        if self.index_task is not None:
+            self.index_task.cancel()
+
+        await app.session.subscriptions.stop()
+        await app.session.metrics_server.stop()
+        await app.session.http.close()
         app.session.redis.close()
         app.session.database.engine.dispose()
+        app.session.executors.shutdown()
+        app.session.performance.shutdown()
         await app.session.redis_async.close()
         await super().close()
 
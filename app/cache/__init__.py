@@ -0,0 +1,7 @@
+
+from .ttl import TTLCache, MISSING
+from .users import UserCache, ChatUser
+from .coalesce import RequestCoalescer
+from .beatmaps import BeatmapFileCache
+from .difficulty import DifficultyCache
+from . import leaderboards, status
@@ -0,0 +1,192 @@
+
+from app.common.helpers.beatmaps import BeatmapResources
+from app.executors import WorkloadExecutor
+from collections import OrderedDict
+from typing import Tuple
+from pathlib import Path
+
+from .coalesce import RequestCoalescer
+
+import threading
+import hashlib
+import logging
+import zlib
+import os
+
+class BeatmapFileCache:
+    """Two-tier cache of .osu files: a size-bounded memory LRU, backed by a local disk cache
+
+    Entries are keyed by beatmap id and verified against the md5 of the
+    beatmap, so that outdated files are fetched again from the resources.
+    """
+
+    def __init__(
+        self,
+        resources: BeatmapResources,
+        executor: WorkloadExecutor,
+        path: str,
+        memory_size: int,
+        disk_size: int,
+        compress: bool = True
+    ) -> None:
+        self.logger = logging.getLogger('beatmap-cache')
+        self.resources = resources
+        self.executor = executor
+        self.path = Path(path)
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.compress = compress
+        self.coalescer = RequestCoalescer()
+
+        # Both tiers are updated from the event loop & from io threads
+        self.memory_lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+
+        # beatmap id -> (md5, content as stored in memory)
+        self.memory: OrderedDict[int, Tuple[str, bytes]] = OrderedDict()
+        self.memory_usage = 0
+
+        # beatmap id -> file size, in order of last access
+        self.disk: OrderedDict[int, int] | None = None
+        self.disk_usage = 0
+
+    async def get(self, beatmap_id: int, md5: str | None = None) -> bytes | None:
+        if (content := self.get_memory(beatmap_id, md5)) is not None:
+            return content
+
+        # Concurrent misses for the same file share one lookup
+        return await self.coalescer.run(
+            (beatmap_id, md5),
+            lambda: self.executor.run(self.load, beatmap_id, md5)
+        )
+
+    async def store(self, beatmap_id: int, content: bytes) -> None:
+        """Replace the cached file of a beatmap, e.g. after it was uploaded"""
+        self.invalidate(beatmap_id)
+        await self.executor.run(self.store_disk, beatmap_id, content)
+        self.store_memory(beatmap_id, hashlib.md5(content).hexdigest(), content)
+
+    def invalidate(self, beatmap_id: int) -> None:
+        with self.memory_lock:
+            if (entry := self.memory.pop(beatmap_id, None)) is not None:
+                self.memory_usage -= len(entry[1])
+
+    def get_memory(self, beatmap_id: int, md5: str | None) -> bytes | None:
+        with self.memory_lock:
+            if (entry := self.memory.get(beatmap_id)) is None:
+                return None
+
+            cached_md5, content = entry
+
+            if md5 is not None and cached_md5 != md5:
+                return None
+
+            self.memory.move_to_end(beatmap_id)
+
+        return zlib.decompress(content) if self.compress else content
+
+    def store_memory(self, beatmap_id: int, md5: str, content: bytes) -> None:
+        content = zlib.compress(content, 1) if self.compress else content
+
+        with self.memory_lock:
+            if (entry := self.memory.pop(beatmap_id, None)) is not None:
+                self.memory_usage -= len(entry[1])
+
+            if len(content) > self.memory_size:
+                return
+
+            self.memory[beatmap_id] = (md5, content)
+            self.memory_usage += len(content)
+
+            while self.memory_usage > self.memory_size:
+                _, (_, evicted) = self.memory.popitem(last=False)
+                self.memory_usage -= len(evicted)
+
+    def load(self, beatmap_id: int, md5: str | None) -> bytes | None:
+        """Look up a file on disk, or fetch it from storage/mirrors, in a worker thread"""
+        content = self.load_disk(beatmap_id)
+
+        if content is not None and md5 is not None and hashlib.md5(content).hexdigest() != md5:
+            # Outdated file on disk
+            content = None
+
+        if content is None:
+            if not (content := self.resources.osu(beatmap_id)):
+                return None
+
+            self.store_disk(beatmap_id, content)
+
+        # Always key the entry by the file we actually got, never by the one we asked for
+        content_md5 = hashlib.md5(content).hexdigest()
+
+        if md5 is not None and content_md5 != md5:
+            self.logger.warning(
+                f'Fetched file of beatmap {beatmap_id} has md5 "{content_md5}", expected "{md5}"'
+            )
+
+        self.store_memory(beatmap_id, content_md5, content)
+        return content
+
+    def file_path(self, beatmap_id: int) -> Path:
+        return self.path / f'{beatmap_id}.osu'
+
+    def scan_disk(self) -> None:
+        """Find existing files of the disk tier, oldest first"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.disk = OrderedDict()
+        self.disk_usage = 0
+
+        files = sorted(
+            (entry for entry in os.scandir(self.path) if entry.name.endswith('.osu')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+
+        for entry in files:
+            if not entry.name[:-4].isdigit():
+                continue
+
+            size = entry.stat().st_size
+            self.disk[int(entry.name[:-4])] = size
+            self.disk_usage += size
+
+    def load_disk(self, beatmap_id: int) -> bytes | None:
+        with self.disk_lock:
+            if self.disk is None:
+                self.scan_disk()
+
+            if beatmap_id not in self.disk:
+                return None
+
+            self.disk.move_to_end(beatmap_id)
+
+        try:
+            return self.file_path(beatmap_id).read_bytes()
+        except FileNotFoundError:
+            with self.disk_lock:
+                self.disk_usage -= self.disk.pop(beatmap_id, 0)
+
+            return None
+
+    def store_disk(self, beatmap_id: int, content: bytes) -> None:
+        with self.disk_lock:
+            if self.disk is None:
+                self.scan_disk()
+
+        # Write to a temporary file first, so readers never see partial files
+        temp_path = self.path / f'{beatmap_id}.osu.{threading.get_ident()}.tmp'
+        temp_path.write_bytes(content)
+        os.replace(temp_path, self.file_path(beatmap_id))
+
+        with self.disk_lock:
+            self.disk_usage -= self.disk.pop(beatmap_id, 0)
+            self.disk[beatmap_id] = len(content)
+            self.disk_usage += len(content)
+            evicted = []
+
+            while self.disk_usage > self.disk_size and len(self.disk) > 1:
+                evicted_id, size = self.disk.popitem(last=False)
+                self.disk_usage -= size
+                evicted.append(evicted_id)
+
+        for evicted_id in evicted:
+            self.file_path(evicted_id).unlink(missing_ok=True)
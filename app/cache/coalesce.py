@@ -0,0 +1,24 @@
+
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+import asyncio
+
+T = TypeVar('T')
+
+class RequestCoalescer:
+    """Shares one running computation with every concurrent caller of the same key"""
+
+    def __init__(self) -> None:
+        self.pending: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        if (task := self.pending.get(key)) is None:
+            task = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+            self.pending[key] = task
+
+        # A cancelled caller must not cancel the computation of the others
+        return await asyncio.shield(task)
@@ -0,0 +1,100 @@
+
+from app.common.helpers.performance import ppv2
+from app.common.constants import Mods
+from redis.asyncio import Redis as RedisAsync
+from typing import List, Tuple
+
+import dataclasses
+import logging
+import json
+
+KeyMods = (
+    Mods.Key1 | Mods.Key2 | Mods.Key3 | Mods.Key4 | Mods.Key5 |
+    Mods.Key6 | Mods.Key7 | Mods.Key8 | Mods.Key9 | Mods.KeyCoop
+)
+
+# Mods that change the difficulty attributes of a beatmap, everything
+# else (e.g. NoFail or SpunOut) only affects the pp of a score.
+# NoVideo shares its bit with TouchDevice, which does change them.
+DifficultyMods = int(
+    Mods.Easy | Mods.NoVideo | Mods.Hidden | Mods.HardRock |
+    Mods.DoubleTime | Mods.Relax | Mods.HalfTime | Mods.Nightcore |
+    Mods.Flashlight | Mods.Autopilot | KeyMods
+)
+
+def difficulty_mods(mods: int, mode: int = 0) -> int:
+    """Reduce mods to the ones that are relevant for difficulty calculation"""
+    mods = int(mods) & DifficultyMods
+
+    if mods & Mods.Nightcore:
+        # Nightcore has the same speed as DoubleTime
+        mods = (mods & ~Mods.Nightcore) | Mods.DoubleTime
+
+    if mode != 0:
+        # Only the flashlight skill of osu!standard depends on these
+        mods &= ~(Mods.Hidden | Mods.Flashlight)
+
+    elif not mods & Mods.Flashlight:
+        mods &= ~Mods.Hidden
+
+    return int(mods)
+
+class DifficultyCache:
+    """Difficulty attributes in redis, shared between every bot process
+
+    Attributes are stored as json in one hash per beatmap md5, so that a
+    changed .osu file never resolves to outdated attributes.
+    """
+
+    def __init__(self, redis: RedisAsync, ttl: int, prefix: str = 'banchobot:difficulty') -> None:
+        self.logger = logging.getLogger('difficulty-cache')
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def key(self, md5: str) -> str:
+        return f'{self.prefix}:{md5}'
+
+    def field(self, mode: int, mods: int) -> str:
+        return f'{mode}:{difficulty_mods(mods, mode)}'
+
+    async def get(self, md5: str, mode: int, mods: int) -> ppv2.DifficultyAttributes | None:
+        try:
+            data = await self.redis.hget(self.key(md5), self.field(mode, mods))
+            return ppv2.DifficultyAttributes(**json.loads(data)) if data is not None else None
+        except Exception as e:
+            # The cache is only an optimization, we can always calculate it again
+            self.logger.warning(f'Failed to read difficulty attributes of "{md5}": {e}')
+            return None
+
+    async def set(self, md5: str, mode: int, mods: int, attributes: ppv2.DifficultyAttributes) -> None:
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(self.key(md5), self.field(mode, mods), json.dumps(dataclasses.asdict(attributes)))
+                pipe.expire(self.key(md5), self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self.logger.warning(f'Failed to store difficulty attributes of "{md5}": {e}')
+
+    async def comparison(self, md5: str, mode: int) -> List[Tuple[int, float | None, float | None]] | None:
+        """Cached /modcompare results, as (mods, star rating, pp)"""
+        try:
+            data = await self.redis.hget(self.key(md5), f'compare:{mode}')
+            return [tuple(entry) for entry in json.loads(data)] if data is not None else None
+        except Exception as e:
+            self.logger.warning(f'Failed to read mod comparison of "{md5}": {e}')
+            return None
+
+    async def set_comparison(self, md5: str, mode: int, results: List[Tuple[int, float | None, float | None]]) -> None:
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(self.key(md5), f'compare:{mode}', json.dumps(results))
+                pipe.expire(self.key(md5), self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self.logger.warning(f'Failed to store mod comparison of "{md5}": {e}')
+
+    async def invalidate(self, md5: str | None) -> None:
+        """Drop all attributes of an outdated .osu file"""
+        if md5 is not None:
+            await self.redis.delete(self.key(md5))
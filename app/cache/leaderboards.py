@@ -0,0 +1,83 @@
+
+from redis.asyncio import Redis as RedisAsync
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Async variants of app.common.cache.leaderboards, for use on the event loop.
+# They read the sorted sets that bancho writes through that module:
+#
+#   bancho:<type>:<mode>            global leaderboard of a mode
+#   bancho:<type>:<mode>:<country>  country leaderboard, lowercase country code
+#
+# with "performance", "ppv1", "rscore" & "tscore" as leaderboard types.
+# Bancho never publishes this layout, so `missing_leaderboards` is used to
+# notice when it diverges from the one in common.
+
+# /rankings types, whose leaderboard is stored under a different name
+RankingLeaderboards = {
+    'score': 'rscore',
+    'total_score': 'tscore'
+}
+
+def leaderboard_type(type: str) -> str:
+    return RankingLeaderboards.get(type, type)
+
+def leaderboard_key(type: str, mode: int, country: str | None = None) -> str:
+    if country:
+        return f'bancho:{leaderboard_type(type)}:{mode}:{country.lower()}'
+
+    return f'bancho:{leaderboard_type(type)}:{mode}'
+
+async def missing_leaderboards(redis: RedisAsync, types: Iterable[str], mode: int = 0) -> List[str]:
+    """Keys of global leaderboards that don't exist, e.g. because common changed their layout"""
+    keys = [leaderboard_key(type, mode) for type in types]
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.exists(key)
+
+        results = await pipe.execute()
+
+    return [key for key, exists in zip(keys, results) if not exists]
+
+async def top_players(
+    redis: RedisAsync,
+    mode: int,
+    offset: int = 0,
+    range: int = 50,
+    type: str = 'performance',
+    country: str | None = None
+) -> List[Tuple[int, float]]:
+    players = await redis.zrevrange(
+        leaderboard_key(type, mode, country),
+        offset,
+        offset + range - 1,
+        withscores=True
+    )
+
+    return [(int(user_id), score) for user_id, score in players]
+
+async def player_rankings(
+    redis: RedisAsync,
+    user_id: int,
+    mode: int,
+    country: str,
+    rankings: Sequence[str] = ('performance', 'ppv1', 'rscore', 'tscore')
+) -> Dict[str, Dict[str, int]]:
+    """Fetch the global & country ranks of a player for every ranking type, in one round trip"""
+    async with redis.pipeline(transaction=False) as pipe:
+        for type in rankings:
+            pipe.zrevrank(leaderboard_key(type, mode), user_id)
+            pipe.zrevrank(leaderboard_key(type, mode, country), user_id)
+
+        results = await pipe.execute()
+
+    return {
+        type: {
+            'global': rank_from_index(results[index * 2]),
+            'country': rank_from_index(results[index * 2 + 1])
+        }
+        for index, type in enumerate(rankings)
+    }
+
+def rank_from_index(index: int | None) -> int:
+    return index + 1 if index is not None else 0
@@ -0,0 +1,7 @@
+
+from redis.asyncio import Redis as RedisAsync
+
+# Async variants of app.common.cache.status, for use on the event loop
+
+async def exists(redis: RedisAsync, user_id: int) -> bool:
+    return bool(await redis.exists(f'bancho:status:{user_id}'))
@@ -0,0 +1,48 @@
+
+from collections import OrderedDict
+from typing import Any, Hashable, List
+
+import time
+
+MISSING = object()
+
+class TTLCache:
+    """Size-bounded in-memory cache, where every entry expires after a fixed time"""
+
+    def __init__(self, ttl: float, size: int = 1024) -> None:
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.size = size
+        self.ttl = ttl
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Any:
+        if (entry := self.entries.get(key)) is None:
+            return MISSING
+
+        expires_at, value = entry
+
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return MISSING
+
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def keys(self) -> List[Hashable]:
+        return list(self.entries)
+
+    def delete(self, key: Hashable) -> None:
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
@@ -0,0 +1,69 @@
+
+from app.common.database.objects import DBUser
+from typing import NamedTuple
+from datetime import datetime
+
+from .ttl import TTLCache, MISSING
+
+class ChatUser(NamedTuple):
+    """The fields of a user, that the chat bridge needs for every message"""
+    id: int
+    name: str
+    silence_end: datetime | None
+    restricted: bool
+
+class UserCache:
+    """Caches discord id -> user lookups, including unlinked discord accounts"""
+
+    def __init__(self, ttl: float, size: int = 10000) -> None:
+        self.entries = TTLCache(ttl, size)
+        # user id -> discord id, bounded & expired like the entries themselves
+        self.discord_ids = TTLCache(ttl, size)
+        # user id -> restricted, for (un)restrictions that bancho may not have applied yet
+        self.restrictions = TTLCache(ttl, size)
+
+    def get(self, discord_id: int) -> ChatUser | None:
+        """Get a cached user, or `MISSING` if the discord id is not cached"""
+        return self.entries.get(discord_id)
+
+    def store(self, discord_id: int, user: DBUser | None) -> ChatUser | None:
+        if user is None:
+            self.entries.set(discord_id, None)
+            return None
+
+        if (restricted := self.restrictions.get(user.id)) is MISSING:
+            restricted = user.restricted
+
+        chat_user = ChatUser(
+            user.id,
+            user.name,
+            user.silence_end,
+            restricted
+        )
+        self.entries.set(discord_id, chat_user)
+        self.discord_ids.set(user.id, discord_id)
+        return chat_user
+
+    def invalidate(self, discord_id: int) -> None:
+        self.entries.delete(discord_id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        if (discord_id := self.discord_ids.get(user_id)) is MISSING:
+            return
+
+        self.discord_ids.delete(user_id)
+        self.entries.delete(discord_id)
+
+    def set_restricted(self, user_id: int, restricted: bool) -> None:
+        """Remember a submitted (un)restriction
+
+        Bancho applies it asynchronously, so a lookup in the meantime would
+        read & cache the previous state from the database again.
+        """
+        self.restrictions.set(user_id, restricted)
+        self.invalidate_user(user_id)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.discord_ids.clear()
+        self.restrictions.clear()
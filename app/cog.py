@@ -1,17 +1,18 @@
 
 from ossapi.ossapiv2_async import OssapiAsync
 from discord.ext.commands import Cog, Context
-from discord import Interaction
-from typing import Callable, Any
+from discord import Interaction, app_commands
+from typing import Callable, List, Any
 
 from app.common.database.objects import DBUser, DBBeatmapset
 from app.common.config import config_instance as config
 from app.common.helpers import permissions
 from app.common.database import users
-from app import session
+from app.cache import ChatUser, MISSING
+from app import session, metrics
 
 import hashlib
-import asyncio
+import time
 
 class BaseCog(Cog):
     def __init__(self) -> None:
@@ -25,6 +26,15 @@ class BaseCog(Cog):
         self.filters = session.filters
         self.database = session.database
         self.requests = session.requests
+        self.http = session.http
+        self.settings = session.settings
+        self.executors = session.executors
+        self.performance = session.performance
+        self.user_cache = session.user_cache
+        self.imports = session.imports
+        self.subscriptions = session.subscriptions
+        self.beatmap_index = session.beatmap_index
+        self.beatmap_files = session.beatmap_files
         self.ossapi: OssapiAsync | None = None
 
         if not config.OSU_CLIENT_ID or not config.OSU_CLIENT_SECRET:
@@ -40,8 +50,18 @@ class BaseCog(Cog):
 
     @staticmethod
     async def run_async(func: Callable, *args, **kwargs):
-        function_wrapper = lambda: func(*args, **kwargs)
-        return await asyncio.get_event_loop().run_in_executor(None, function_wrapper)
+        """Run a blocking database call inside the database pool"""
+        return await session.executors.database.run(func, *args, **kwargs)
+
+    @staticmethod
+    async def run_io(func: Callable, *args, **kwargs):
+        """Run blocking storage or http calls inside the io pool"""
+        return await session.executors.io.run(func, *args, **kwargs)
+
+    @staticmethod
+    async def run_cpu(func: Callable, *args, **kwargs):
+        """Run cpu-heavy work, e.g. beatmap parsing, inside the cpu pool"""
+        return await session.executors.cpu.run(func, *args, **kwargs)
 
     @staticmethod
     def avatar_url(user: DBUser) -> str:
@@ -56,10 +76,28 @@ class BaseCog(Cog):
         url += f"?c={update_hash}"
         return url
 
+    def beatmap_choices(self, current: str) -> List[app_commands.Choice[int]]:
+        """Autocomplete choices for beatmap ids, taken from the search index"""
+        return [
+            app_commands.Choice(name=name[:100], value=beatmap_id)
+            for beatmap_id, name in self.beatmap_index.suggest_beatmaps(current)
+        ]
+
+    def beatmapset_choices(self, current: str) -> List[app_commands.Choice[int]]:
+        """Autocomplete choices for beatmapset ids, taken from the search index"""
+        return [
+            app_commands.Choice(name=f'{entry.artist} - {entry.title} ({entry.creator})'[:100], value=entry.id)
+            for entry in self.beatmap_index.suggest_beatmapsets(current)
+        ]
+
     async def cog_before_invoke(self, ctx: Context) -> None:
         if ctx.command is None:
             return
 
+        metrics.current_command.set(ctx.command.qualified_name)
+        ctx.queries = metrics.count_queries()
+        ctx.started_at = time.perf_counter()
+
         options = {
             key: value
             for key, value in ctx.kwargs.items()
@@ -69,10 +107,29 @@ class BaseCog(Cog):
             f"@{ctx.author.name} -> /{ctx.command.qualified_name} {options}"
         )
 
+    async def cog_after_invoke(self, ctx: Context) -> None:
+        if ctx.command is None:
+            return
+
+        if (started_at := getattr(ctx, "started_at", None)) is None:
+            return
+
+        metrics.command_duration.observe(
+            time.perf_counter() - started_at,
+            ctx.command.qualified_name
+        )
+
+        if (queries := getattr(ctx, "queries", None)) is not None:
+            metrics.command_queries.observe(queries.count, ctx.command.qualified_name)
+
     async def interaction_check(self, interaction: Interaction) -> bool:
         if interaction.command is None:
             return True
 
+        metrics.current_command.set(interaction.command.qualified_name)
+        interaction.extras["queries"] = metrics.count_queries()
+        interaction.extras.setdefault("started_at", time.perf_counter())
+
         options = (
             interaction.namespace.__dict__
             if interaction.namespace else {}
@@ -88,6 +145,13 @@ class BaseCog(Cog):
             discord_id
         )
 
+    async def resolve_chat_user(self, discord_id: int) -> ChatUser | None:
+        if (user := self.user_cache.get(discord_id)) is not MISSING:
+            return user
+
+        user = await self.resolve_user(discord_id)
+        return self.user_cache.store(discord_id, user)
+
     async def resolve_user_by_id(self, user_id: int) -> DBUser | None:
         return await self.run_async(
             users.fetch_by_id,
@@ -128,17 +192,29 @@ class BaseCog(Cog):
         return await self.resolve_user_by_name_case_insensitive(identifier)
 
     async def update_user(self, user_id: int, updates: dict) -> int:
-        return await self.run_async(
+        result = await self.run_async(
             users.update,
             user_id, updates
         )
+        self.user_cache.invalidate_user(user_id)
+
+        if discord_id := updates.get("discord_id"):
+            # Account was linked, remove the "unlinked" entry
+            self.user_cache.invalidate(discord_id)
+
+        return result
 
     async def submit_event(self, name: str, *args) -> None:
-        return await self.run_async(
-            self.events.submit,
+        result = await self.run_async(
+            metrics.timed("redis", self.events.submit),
             name, *args
         )
 
+        if name in ("restrict", "unrestrict"):
+            self.user_cache.set_restricted(args[0], name == "restrict")
+
+        return result
+
     async def has_permission(self, user_id: int, permission: str) -> bool:
         return await self.run_async(
             permissions.has_permission,
@@ -0,0 +1,107 @@
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Any
+from app import metrics
+
+import contextvars
+import threading
+import asyncio
+import time
+
+class WorkloadExecutor:
+    """Bounded thread pool for a single kind of blocking work"""
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f'banchobot-{name}'
+        )
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queued
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        with self.lock:
+            self.queued += 1
+
+        # Carry over context variables, e.g. the current command for metrics
+        context = contextvars.copy_context()
+        submitted_at = time.perf_counter()
+
+        future = self.pool.submit(
+            context.run, self.execute,
+            func, args, kwargs, submitted_at
+        )
+        future.add_done_callback(self.on_done)
+        return await asyncio.wrap_future(future)
+
+    def execute(self, func: Callable, args: tuple, kwargs: dict, submitted_at: float) -> Any:
+        with self.lock:
+            self.queued -= 1
+            self.active += 1
+
+        metrics.executor_wait.observe(
+            time.perf_counter() - submitted_at,
+            self.name, metrics.command_label()
+        )
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def on_done(self, future: Future) -> None:
+        if not future.cancelled():
+            return
+
+        # Cancelled before a worker picked it up
+        with self.lock:
+            self.queued -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': self.max_workers,
+            'active': self.active,
+            'queued': self.queued
+        }
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class Executors:
+    """Separate pools for database, storage/http and cpu-bound work"""
+
+    def __init__(
+        self,
+        database_workers: int,
+        io_workers: int,
+        cpu_workers: int
+    ) -> None:
+        self.database = WorkloadExecutor('database', database_workers)
+        self.io = WorkloadExecutor('io', io_workers)
+        self.cpu = WorkloadExecutor('cpu', cpu_workers)
+
+    @property
+    def pools(self) -> Dict[str, WorkloadExecutor]:
+        return {
+            'database': self.database,
+            'io': self.io,
+            'cpu': self.cpu
+        }
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: executor.stats()
+            for name, executor in self.pools.items()
+        }
+
+    def shutdown(self) -> None:
+        for executor in self.pools.values():
+            executor.shutdown()
@@ -4,17 +4,20 @@ from app.common.config import config_instance as config
 from app.common.constants import BeatmapStatus
 from app import beatmaps as beatmap_helper
 from app.extensions.types import *
+from app.imports import ImportOptions, ImportResult, ImportJob, ImportBatch
 from app.cog import BaseCog
+from app import metrics
 
-from discord import app_commands, Interaction, Attachment, Member
+from discord import app_commands, Interaction, Attachment, Member, HTTPException
+from redis.exceptions import LockError
 from discord.ext.commands import Bot
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Tuple, Any
 
-import zipfile
 import hashlib
-import stat
-import io
+import asyncio
+import time
+import re
 
 ALLOWED_ROLE_IDS = {config.DISCORD_STAFF_ROLE_ID, config.DISCORD_BAT_ROLE_ID}
 
@@ -24,7 +27,63 @@ def role_check(interaction: Interaction) -> bool:
 
     return any(role.id in ALLOWED_ROLE_IDS for role in interaction.user.roles)
 
+def parse_beatmapset_ids(text: str) -> List[int]:
+    """Parse beatmapset IDs & links, separated by whitespace, commas or semicolons"""
+    ids = []
+
+    for token in re.split(r'[\s,;]+', text):
+        if match := re.search(r'(?:beatmapsets|s)/(\d+)', token):
+            ids.append(int(match.group(1)))
+
+        elif token.isdigit():
+            ids.append(int(token))
+
+    return ids
+
 class BeatmapManagement(BaseCog):
+    def __init__(self) -> None:
+        super().__init__()
+        self.import_workers: List[asyncio.Task] = []
+        self.import_progress: Dict[str, float] = {}
+        self.import_owner: str | None = None
+
+    async def cog_load(self) -> None:
+        # Workers of other processes & earlier loads of this cog keep their
+        # own jobs, until their lease expires
+        self.import_owner = await self.imports.register()
+        self.import_workers = [
+            asyncio.create_task(self.import_heartbeat()),
+            *(
+                asyncio.create_task(self.import_worker())
+                for _ in range(self.settings.IMPORT_WORKERS)
+            )
+        ]
+
+    async def cog_unload(self) -> None:
+        for task in self.import_workers:
+            task.cancel()
+
+        await asyncio.gather(*self.import_workers, return_exceptions=True)
+
+        # Nothing is running anymore, so interrupted jobs can be picked up right away
+        if released := await self.imports.release(self.import_owner):
+            self.logger.info(f'Released {released} interrupted beatmapset imports')
+
+    async def import_heartbeat(self) -> None:
+        """Keep the lease of our workers alive & resume jobs of expired ones"""
+        while True:
+            try:
+                await self.imports.renew(self.import_owner)
+
+                if resumed := await self.imports.resume():
+                    self.logger.info(f'Resuming {resumed} interrupted beatmapset imports')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f'Failed to renew import lease: {e}', exc_info=e)
+
+            await asyncio.sleep(self.settings.IMPORT_WORKER_LEASE / 3)
+
     @app_commands.command(name="addset", description="Add a beatmapset from bancho to Titanic!")
     @app_commands.check(role_check)
     async def add_beatmapset(
@@ -57,37 +116,295 @@ class BeatmapManagement(BaseCog):
                 ephemeral=True
             )
 
+        lock = self.imports.lock(beatmapset_id, self.settings.IMPORT_LOCK_TIMEOUT)
+
+        if not await lock.acquire():
+            return await interaction.response.send_message(
+                f"Beatmapset `{beatmapset_id}` is already being imported!",
+                ephemeral=True
+            )
+
+        try:
+            # Another import could have finished before we got the lock
+            if await self.fetch_beatmapset(beatmapset_id):
+                return await interaction.response.send_message(
+                    f"Beatmapset `{beatmapset_id}` was already added to Titanic!",
+                    ephemeral=True
+                )
+
+            await interaction.response.defer()
+            result = await self.import_beatmapset(
+                ossapi_set,
+                ImportOptions(
+                    round_decimal_values,
+                    fix_leadin_times,
+                    fix_perfect_curves,
+                    move_to_pending
+                )
+            )
+        finally:
+            await self.release_lock(lock)
+
+        database_set = result.beatmapset
+        await self.beatmap_index.refresh(database_set.id)
+        followup = f"Successfully added [{database_set.full_name}](http://osu.{config.DOMAIN_NAME}/s/{database_set.id}) to Titanic!"
+        total_beatmaps = len(database_set.beatmaps) - 1  # why -1, i don't understand
+
+        if round_decimal_values:
+            followup += f"\n(Fixed {result.decimal_updates}/{total_beatmaps} beatmaps with decimal values)"
+
+        if fix_leadin_times:
+            followup += f"\n(Fixed lead-in times for {result.leadin_updates}/{total_beatmaps} beatmaps)"
+
+        if fix_perfect_curves:
+            followup += f"\n(Fixed perfect curves for {result.curve_updates}/{total_beatmaps} beatmaps)"
+
+        # TODO: Discord webhook updates
+        return await interaction.followup.send(followup)
+
+    @app_commands.command(name="addsets", description="Add multiple beatmapsets from bancho to Titanic!")
+    @app_commands.describe(
+        beatmapset_ids="Beatmapset IDs or links, separated by spaces or commas",
+        file="A text file, that lists beatmapset IDs or links"
+    )
+    @app_commands.check(role_check)
+    async def add_beatmapsets(
+        self,
+        interaction: Interaction,
+        beatmapset_ids: str | None = None,
+        file: Attachment | None = None,
+        round_decimal_values: bool = True,
+        fix_leadin_times: bool = True,
+        fix_perfect_curves: bool = True,
+        move_to_pending: bool = True
+    ) -> None:
+        if not self.ossapi:
+            return await interaction.response.send_message(
+                "I am not configured to use the osu!api.",
+                ephemeral=True
+            )
+
+        ids = parse_beatmapset_ids(beatmapset_ids or '')
+
+        if file is not None:
+            content = await file.read()
+            ids += parse_beatmapset_ids(content.decode('utf-8', errors='ignore'))
+
+        # Remove duplicates, but keep the order
+        ids = list(dict.fromkeys(ids))
+
+        if not ids:
+            return await interaction.response.send_message(
+                "Please provide at least one beatmapset ID.",
+                ephemeral=True
+            )
+
         await interaction.response.defer()
+        message = await interaction.followup.send(
+            f"Queued {len(ids)} beatmapsets for import...",
+            wait=True
+        )
 
-        database_set = await self.run_async(
-            beatmap_helper.store_ossapi_beatmapset,
-            ossapi_set
+        batch = await self.imports.create_batch(
+            interaction.channel_id,
+            message.id,
+            len(ids)
         )
-        filesize, filesize_novideo = await self.run_async(
-            beatmap_helper.fetch_osz_filesizes,
-            database_set.id
+        await self.imports.enqueue(
+            batch, ids,
+            ImportOptions(
+                round_decimal_values,
+                fix_leadin_times,
+                fix_perfect_curves,
+                move_to_pending
+            )
+        )
+
+    async def import_worker(self) -> None:
+        while True:
+            try:
+                if not (entry := await self.imports.next(self.import_owner, timeout=5)):
+                    continue
+
+                job, payload = entry
+
+                with metrics.track_command("addsets"):
+                    outcome, error = await self.process_import(job)
+
+                try:
+                    batch = await self.imports.record(job, outcome, error)
+                finally:
+                    # The job is done, even if its outcome could not be recorded
+                    await self.imports.complete(self.import_owner, payload)
+
+                if batch is not None:
+                    await self.report_import_progress(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f'Import worker failed: {e}', exc_info=e)
+                await asyncio.sleep(5)
+
+    async def process_import(self, job: ImportJob) -> Tuple[str, str | None]:
+        """Import a single queued beatmapset & return its outcome"""
+        if not self.ossapi:
+            return "failed", "osu!api is not configured"
+
+        lock = self.imports.lock(job.beatmapset_id, self.settings.IMPORT_LOCK_TIMEOUT)
+
+        if not await lock.acquire():
+            return "skipped", "already being imported"
+
+        try:
+            if await self.fetch_beatmapset(job.beatmapset_id):
+                return "skipped", None
+
+            try:
+                ossapi_set = await self.ossapi.beatmapset(job.beatmapset_id)
+                assert ossapi_set is not None
+            except (ValueError, AssertionError):
+                return "failed", "does not exist on bancho"
+
+            await self.import_beatmapset(ossapi_set, job.options)
+            await self.beatmap_index.refresh(job.beatmapset_id)
+            return "added", None
+        except Exception as e:
+            self.logger.error(f'Failed to import beatmapset {job.beatmapset_id}: {e}', exc_info=e)
+            return "failed", str(e) or type(e).__name__
+        finally:
+            await self.release_lock(lock)
+
+    async def report_import_progress(self, batch: ImportBatch) -> None:
+        """Edit the followup message of a batch, at most every few seconds"""
+        now = time.monotonic()
+        last_update = self.import_progress.get(batch.id, 0)
+
+        if not batch.finished and now - last_update < self.settings.IMPORT_PROGRESS_INTERVAL:
+            return
+
+        if batch.finished:
+            self.import_progress.pop(batch.id, None)
+        else:
+            self.import_progress[batch.id] = now
+
+        content = (
+            f"Finished importing {batch.total} beatmapsets!"
+            if batch.finished else
+            f"Importing beatmapsets... ({batch.processed}/{batch.total})"
         )
+        content += f"\nAdded: {batch.added} | Skipped: {batch.skipped} | Failed: {batch.failed}"
+
+        if errors := await self.imports.errors(batch.id):
+            content += "\n```\n" + "\n".join(errors) + "\n```"
+
+        try:
+            channel = (
+                self.bot.get_channel(batch.channel_id) or
+                await self.bot.fetch_channel(batch.channel_id)
+            )
+            await channel.get_partial_message(batch.message_id).edit(content=content)
+        except HTTPException as e:
+            self.logger.warning(f'Failed to update import progress of batch {batch.id}: {e}')
+
+    async def import_beatmapset(self, ossapi_set: Any, options: ImportOptions) -> ImportResult:
+        """Fetch, patch and upload all beatmaps of a beatmapset from the osu!api & store it"""
+        semaphore = asyncio.Semaphore(self.settings.ADDSET_CONCURRENCY)
+
+        async def import_beatmap(ossapi_map: Any) -> Tuple[Tuple[bool, bool, bool], dict, bytes | None]:
+            async with semaphore:
+                return await self.import_beatmap(
+                    ossapi_map,
+                    options.round_decimal_values,
+                    options.fix_leadin_times,
+                    options.fix_perfect_curves
+                )
+
+        # Everything that needs the network happens before the database is
+        # touched, so that no connection is held open while waiting on it
+        filenames, (filesize, filesize_novideo), results = await asyncio.gather(
+            asyncio.gather(*(
+                beatmap_helper.resolve_beatmap_filename(beatmap.id)
+                for beatmap in ossapi_set.beatmaps
+            )),
+            beatmap_helper.fetch_osz_filesizes(ossapi_set.id),
+            asyncio.gather(*(import_beatmap(beatmap) for beatmap in ossapi_set.beatmaps))
+        )
+
+        beatmapset_updates = {'osz_filesize': filesize, 'osz_filesize_novideo': filesize_novideo}
+        beatmap_updates = [
+            {'id': beatmap.id, **updates}
+            for beatmap, (_, updates, _) in zip(ossapi_set.beatmaps, results)
+        ]
+        patched_files = {
+            beatmap.id: content
+            for beatmap, (_, _, content) in zip(ossapi_set.beatmaps, results)
+            if content is not None
+        }
+
+        if options.move_to_pending:
+            beatmapset_updates['status'] = BeatmapStatus.Pending.value
+
+            for updates in beatmap_updates:
+                updates['status'] = BeatmapStatus.Pending.value
 
-        decimal_updates = 0
-        leadin_updates = 0
-        curve_updates = 0
+        await asyncio.gather(*(
+            self.run_io(self.storage.upload_beatmap_file, beatmap_id, content)
+            for beatmap_id, content in patched_files.items()
+        ))
 
-        for beatmap in database_set.beatmaps:
-            content = await self.run_async(
-                self.beatmaps.osu,
-                beatmap.id
+        try:
+            # Everything is written in one short transaction, so that a failed
+            # import can't leave a half-imported beatmapset behind
+            database_set = await self.run_async(
+                beatmap_helper.store_imported_beatmapset,
+                ossapi_set,
+                {beatmap.id: filename for beatmap, filename in zip(ossapi_set.beatmaps, filenames)},
+                beatmapset_updates,
+                [updates for updates in beatmap_updates if len(updates) > 1]
             )
+        except Exception:
+            # Don't leave patched files behind, for beatmaps that were never stored
+            if patched_files:
+                await self.run_io(self.storage.remove_beatmap_files, list(patched_files))
 
-            if not content:
-                continue
+            raise
 
-            parsed_beatmap = beatmap_helper.parse_beatmap(content, beatmap.id)
-            if parsed_beatmap is None:
-                continue
+        for beatmap_id, content in patched_files.items():
+            await self.beatmap_files.store(beatmap_id, content)
 
-            ossapi_map = next((b for b in ossapi_set.beatmaps if b.id == beatmap.id), None)
-            if ossapi_map is None:
-                continue
+        fixes = [fixes for fixes, _, _ in results]
+
+        return ImportResult(
+            database_set,
+            decimal_updates=sum(decimals_fixed for decimals_fixed, _, _ in fixes),
+            leadin_updates=sum(leadin_fixed for _, leadin_fixed, _ in fixes),
+            curve_updates=sum(curves_fixed for _, _, curves_fixed in fixes)
+        )
+
+    async def release_lock(self, lock: Any) -> None:
+        try:
+            await lock.release()
+        except LockError:
+            # The lock expired while the import was still running
+            self.logger.warning(f'Import lock "{lock.name}" expired before it was released')
+
+    async def import_beatmap(
+        self,
+        ossapi_map: Any,
+        round_decimal_values: bool,
+        fix_leadin_times: bool,
+        fix_perfect_curves: bool
+    ) -> Tuple[Tuple[bool, bool, bool], dict, bytes | None]:
+        """Fetch & patch a single difficulty of a new beatmapset & return its database updates and patched file"""
+        content = await self.beatmap_files.get(ossapi_map.id)
+
+        if not content:
+            return (False, False, False), {}, None
+
+        def patch_beatmap() -> Tuple[dict, Tuple[bool, bool, bool], bytes | None] | None:
+            parsed_beatmap = beatmap_helper.parse_beatmap(content, ossapi_map.id)
+            if parsed_beatmap is None:
+                return None
 
             beatmap_updates = {
                 "slider_multiplier": parsed_beatmap.slider_multiplier,
@@ -97,78 +414,31 @@ class BeatmapManagement(BaseCog):
                 "count_spinner": ossapi_map.count_spinners
             }
 
-            if beatmap.slider_multiplier != parsed_beatmap.slider_multiplier:
-                # Slider multiplier changed from db to api
-                beatmap_updates['slider_multiplier'] = parsed_beatmap.slider_multiplier
-
-            decimals_fixed, leadin_fixed, curves_fixed = beatmap_helper.apply_beatmap_patches(
+            fixes = beatmap_helper.apply_beatmap_patches(
                 parsed_beatmap,
                 round_decimal_values,
                 fix_leadin_times,
                 fix_perfect_curves
             )
-            file_updated = any(
-                [decimals_fixed, leadin_fixed, curves_fixed]
-            )
 
-            if decimals_fixed:
+            if fixes[0]:
                 beatmap_updates['od'] = int(parsed_beatmap.overall_difficulty)
                 beatmap_updates['ar'] = int(parsed_beatmap.approach_rate)
                 beatmap_updates['hp'] = int(parsed_beatmap.hp_drain_rate)
                 beatmap_updates['cs'] = int(parsed_beatmap.circle_size)
-                decimal_updates += 1
-
-            if leadin_fixed:
-                leadin_updates += 1
-
-            if curves_fixed:
-                curve_updates += 1
 
-            if file_updated:
-                content_updated = beatmap_helper.pack_beatmap(parsed_beatmap)
-                beatmap_updates['md5'] = hashlib.md5(content_updated).hexdigest()
+            if not any(fixes):
+                return beatmap_updates, fixes, None
 
-                await self.run_async(
-                    self.storage.upload_beatmap_file,
-                    beatmap.id,
-                    content_updated
-                )
+            content_updated = beatmap_helper.pack_beatmap(parsed_beatmap)
+            beatmap_updates['md5'] = hashlib.md5(content_updated).hexdigest()
+            return beatmap_updates, fixes, content_updated
 
-            if beatmap_updates:
-                await self.update_beatmap(
-                    beatmap.id,
-                    beatmap_updates
-                )
+        if not (result := await self.run_cpu(patch_beatmap)):
+            return (False, False, False), {}, None
 
-        await self.update_beatmapset(
-            database_set.id,
-            {'osz_filesize': filesize, 'osz_filesize_novideo': filesize_novideo}
-        )
-
-        if move_to_pending:
-            await self.update_beatmapset(
-                database_set.id,
-                {'status': BeatmapStatus.Pending.value}
-            )
-            await self.update_beatmaps_by_set_id(
-                database_set.id,
-                {'status': BeatmapStatus.Pending.value}
-            )
-
-        followup = f"Successfully added [{database_set.full_name}](http://osu.{config.DOMAIN_NAME}/s/{database_set.id}) to Titanic!"
-        total_beatmaps = len(database_set.beatmaps) - 1  # why -1, i don't understand
-
-        if round_decimal_values:
-            followup += f"\n(Fixed {decimal_updates}/{total_beatmaps} beatmaps with decimal values)"
-
-        if fix_leadin_times:
-            followup += f"\n(Fixed lead-in times for {leadin_updates}/{total_beatmaps} beatmaps)"
-
-        if fix_perfect_curves:
-            followup += f"\n(Fixed perfect curves for {curve_updates}/{total_beatmaps} beatmaps)"
-
-        # TODO: Discord webhook updates
-        return await interaction.followup.send(followup)
+        beatmap_updates, fixes, content_updated = result
+        return fixes, beatmap_updates, content_updated
 
     @app_commands.command(name="deleteset", description="Delete a beatmapset from Titanic's database")
     @app_commands.check(role_check)
@@ -204,10 +474,20 @@ class BeatmapManagement(BaseCog):
                 )
 
         await interaction.response.defer()
+        beatmap_ids = [beatmap.id for beatmap in beatmapset.beatmaps]
+
         await self.run_async(
             beatmap_helper.delete_beatmapset,
             beatmapset
         )
+        await beatmap_helper.remove_beatmap_files(
+            beatmapset.id,
+            beatmap_ids
+        )
+        self.beatmap_index.remove(beatmapset.id)
+
+        for beatmap_id in beatmap_ids:
+            self.beatmap_files.invalidate(beatmap_id)
 
         return await interaction.followup.send(
             f"Successfully deleted beatmapset `{beatmapset.full_name}`!"
@@ -256,6 +536,12 @@ class BeatmapManagement(BaseCog):
             beatmap_helper.delete_beatmap,
             beatmap
         )
+        await beatmap_helper.remove_beatmap_files(
+            None,
+            [beatmap.id]
+        )
+        await self.beatmap_index.refresh(beatmap.set_id)
+        self.beatmap_files.invalidate(beatmap.id)
 
         return await interaction.followup.send(
             f"Successfully deleted beatmap `{beatmap.full_name}`!"
@@ -300,6 +586,10 @@ class BeatmapManagement(BaseCog):
             f"Successfully updated the status of [{beatmapset.full_name}](http://osu.{config.DOMAIN_NAME}/s/{beatmapset.id}) to `{status.name}`!"
         )
 
+    @modify_beatmapset_command.autocomplete("beatmapset_id")
+    async def modify_beatmapset_autocomplete(self, interaction: Interaction, current: str) -> List[app_commands.Choice[int]]:
+        return self.beatmapset_choices(current)
+
     @app_commands.command(name="moddiff", description="Modify a single beatmap's status")
     @app_commands.check(role_check)
     async def modify_beatmap_command(
@@ -347,10 +637,12 @@ class BeatmapManagement(BaseCog):
         await interaction.response.defer()
         content = await attachment.read()
 
-        await self.run_async(
+        await self.run_io(
             self.storage.upload_beatmap_file,
             beatmap.id, content
         )
+        await self.beatmap_files.store(beatmap.id, content)
+        await self.performance.invalidate(beatmap.md5)
         await self.update_beatmap(
             beatmap.id,
             {'md5': hashlib.md5(content).hexdigest()}
@@ -378,9 +670,9 @@ class BeatmapManagement(BaseCog):
                 ephemeral=True
             )
 
-        content = await self.run_async(
-            self.beatmaps.osu,
-            beatmap.id
+        content = await self.beatmap_files.get(
+            beatmap.id,
+            beatmap.md5
         )
 
         if not content:
@@ -389,48 +681,55 @@ class BeatmapManagement(BaseCog):
                 ephemeral=True
             )
 
-        parsed_beatmap = beatmap_helper.parse_beatmap(
-            content,
-            beatmap.id
-        )
-        if parsed_beatmap is None:
-            return await interaction.response.send_message(
-                f"Failed to parse the .osu file for [{beatmap.full_name}]({beatmap.link})!",
-                ephemeral=True
+        await interaction.response.defer()
+
+        def patch_beatmap() -> Tuple[Tuple[bool, bool, bool], dict, bytes | None] | None:
+            parsed_beatmap = beatmap_helper.parse_beatmap(content, beatmap.id)
+            if parsed_beatmap is None:
+                return None
+
+            fixes = beatmap_helper.apply_beatmap_patches(
+                parsed_beatmap,
+                fix_decimal_values,
+                fix_leadin_times,
+                fix_perfect_curves
             )
 
-        await interaction.response.defer()
+            if not any(fixes):
+                return fixes, {}, None
 
-        decimals_fixed, leadin_fixed, curves_fixed = beatmap_helper.apply_beatmap_patches(
-            parsed_beatmap,
-            fix_decimal_values,
-            fix_leadin_times,
-            fix_perfect_curves
-        )
-        file_updated = any(
-            [decimals_fixed, leadin_fixed, curves_fixed]
-        )
+            updates: dict[str, int | str] = {
+                'od': int(parsed_beatmap.overall_difficulty),
+                'ar': int(parsed_beatmap.approach_rate),
+                'hp': int(parsed_beatmap.hp_drain_rate),
+                'cs': int(parsed_beatmap.circle_size)
+            }
 
-        if not file_updated:
+            content_updated = beatmap_helper.pack_beatmap(parsed_beatmap)
+            updates['md5'] = hashlib.md5(content_updated).hexdigest()
+            return fixes, updates, content_updated
+
+        # Parsing, patching & packing all happen inside of the cpu pool
+        if not (result := await self.run_cpu(patch_beatmap)):
             return await interaction.followup.send(
-                f"No issues found in the .osu file for [{beatmap.full_name}](http://osu.{config.DOMAIN_NAME}/b/{beatmap.id})!",
+                f"Failed to parse the .osu file for [{beatmap.full_name}]({beatmap.link})!",
                 ephemeral=True
             )
 
-        updates: dict[str, int | str] = {
-            'od': int(parsed_beatmap.overall_difficulty),
-            'ar': int(parsed_beatmap.approach_rate),
-            'hp': int(parsed_beatmap.hp_drain_rate),
-            'cs': int(parsed_beatmap.circle_size)
-        }
+        _, updates, content_updated = result
 
-        content_updated = beatmap_helper.pack_beatmap(parsed_beatmap)
-        updates['md5'] = hashlib.md5(content_updated).hexdigest()
+        if content_updated is None:
+            return await interaction.followup.send(
+                f"No issues found in the .osu file for [{beatmap.full_name}](http://osu.{config.DOMAIN_NAME}/b/{beatmap.id})!",
+                ephemeral=True
+            )
 
-        await self.run_async(
+        await self.run_io(
             self.storage.upload_beatmap_file,
             beatmap.id, content_updated
         )
+        await self.beatmap_files.store(beatmap.id, content_updated)
+        await self.performance.invalidate(beatmap.md5)
         await self.update_beatmap(
             beatmap.id,
             updates
@@ -440,6 +739,10 @@ class BeatmapManagement(BaseCog):
             f"Successfully fixed the .osu file for [{beatmap.full_name}]({beatmap.url})!"
         )
 
+    @fix_beatmap_command.autocomplete("beatmap_id")
+    async def fix_beatmap_autocomplete(self, interaction: Interaction, current: str) -> List[app_commands.Choice[int]]:
+        return self.beatmap_choices(current)
+
     @app_commands.command(name="downloadset", description="Move the files of a beatmapset from Bancho to Titanic")
     @app_commands.check(role_check)
     async def download_beatmapset_command(
@@ -462,51 +765,56 @@ class BeatmapManagement(BaseCog):
         await interaction.response.defer()
         response_details = []
 
-        background_file = await self.run_async(
+        background_file = await self.run_io(
             self.beatmaps.background,
             beatmapset_id, True
         )
-        audio_file = await self.run_async(
+        audio_file = await self.run_io(
             self.beatmaps.preview,
             beatmapset_id
         )
 
         if background_file is not None:
-            await self.run_async(
+            await self.run_io(
                 self.storage.upload_background,
                 beatmapset_id, background_file
             )
 
         if audio_file is not None:
-            await self.run_async(
+            await self.run_io(
                 self.storage.upload_mp3,
                 beatmapset_id, audio_file
             )
 
         for beatmap in beatmapset.beatmaps:
-            osu_file = await self.run_async(
-                self.beatmaps.osu,
-                beatmap.id
+            osu_file = await self.beatmap_files.get(
+                beatmap.id,
+                beatmap.md5
             )
 
             if osu_file is None:
                 response_details.append(f"- Beatmap `{beatmap.id}`: .osu file not found")
                 continue
 
-            await self.run_async(
+            await self.run_io(
                 self.storage.upload_beatmap_file,
                 beatmap.id, osu_file
             )
 
-        osz_iterator, _ = await self.run_async(
+        osz_iterator, _ = await self.run_io(
             self.beatmaps.osz,
             beatmapset_id
         )
 
         if osz_iterator is not None:
-            await self.run_async(
-                self.storage.upload_osz,
-                beatmapset_id, b"".join(osz_iterator)
+            # Chunks are uploaded while the download is still running
+            osz_size, osz_checksum = await self.run_io(
+                beatmap_helper.transfer_osz,
+                beatmapset_id, osz_iterator
+            )
+            self.logger.info(
+                f"Transferred .osz for {beatmapset_id} "
+                f"({osz_size} bytes, md5: {osz_checksum})"
             )
         else:
             response_details.append(
@@ -546,7 +854,7 @@ class BeatmapManagement(BaseCog):
 
         await interaction.response.defer()
 
-        osz_file = await self.run_async(
+        osz_file = await self.run_io(
             self.storage.get_osz,
             beatmapset.id
         )
@@ -558,39 +866,30 @@ class BeatmapManagement(BaseCog):
                 ephemeral=True
             )
 
-        with zipfile.ZipFile(io.BytesIO(osz_file), 'r') as osz_read:
-            write_buffer = io.BytesIO()
-
-            with zipfile.ZipFile(write_buffer, 'w', zipfile.ZIP_DEFLATED) as osz_write:
-                # Copy over .osu files
-                for beatmap in beatmapset.beatmaps:
-                    if beatmap.status <= BeatmapStatus.Inactive:
-                        continue
+        beatmap_files = []
 
-                    osu_file = await self.run_async(
-                        self.beatmaps.osu,
-                        beatmap.id
-                    )
+        for beatmap in beatmapset.beatmaps:
+            if beatmap.status <= BeatmapStatus.Inactive:
+                continue
 
-                    if osu_file is None:
-                        continue
+            osu_file = await self.beatmap_files.get(
+                beatmap.id,
+                beatmap.md5
+            )
 
-                    zip_info = zipfile.ZipInfo(filename=beatmap.filename)
-                    zip_info.compress_type = zipfile.ZIP_DEFLATED
-                    zip_info.date_time = beatmap.last_update.timetuple()[:6]
-                    zip_info.external_attr = (stat.S_IFREG | 0o664) << 16
-                    osz_write.writestr(zip_info, osu_file)
+            if osu_file is None:
+                continue
 
-                # Copy over other files (backgrounds, audio, etc...)
-                for item in osz_read.infolist():
-                    if not item.filename.endswith('.osu'):
-                        item.compress_type = zipfile.ZIP_DEFLATED
-                        item.external_attr = (stat.S_IFREG | 0o664) << 16
-                        osz_write.writestr(item, osz_read.read(item.filename))
+            beatmap_files.append((
+                beatmap.filename,
+                beatmap.last_update.timetuple()[:6],
+                osu_file
+            ))
 
-        await self.run_async(
-            self.storage.upload_osz,
-            beatmapset.id, write_buffer.getvalue()
+        # Other files are copied over without being recompressed
+        await self.run_io(
+            beatmap_helper.update_osz_beatmaps,
+            beatmapset.id, osz_file, beatmap_files
         )
         return await interaction.followup.send(
             f"Successfully updated the .osz file for [{beatmapset.full_name}](http://osu.{config.DOMAIN_NAME}/s/{beatmapset.id})!\n"
@@ -1,11 +1,12 @@
 
 from app.common.config import config_instance as config
 from app.common.database.repositories import messages
-from app.common.database.objects import DBUser
 from app.common.constants.regexes import *
 from app.common.helpers import infringements
 from discord.ext.commands import Cog, Bot
+from app.cache import ChatUser
 from app.cog import BaseCog
+from app import metrics
 
 import discord
 
@@ -21,7 +22,11 @@ class BanchoChatBridge(BaseCog):
         if message.channel.id != config.CHAT_CHANNEL_ID:
             return
 
-        target_user = await self.resolve_user(message.author.id)
+        with metrics.track_command("bridge"):
+            await self.relay_message(message)
+
+    async def relay_message(self, message: discord.Message) -> None:
+        target_user = await self.resolve_chat_user(message.author.id)
 
         if not target_user:
             return self.logger.warning(
@@ -123,11 +128,15 @@ class BanchoChatBridge(BaseCog):
             message_content
         )
 
-    async def silence_user(self, user: DBUser, duration: float, reason: str) -> None:
-        return await self.run_async(
+    async def silence_user(self, chat_user: ChatUser, duration: float, reason: str) -> None:
+        if not (user := await self.resolve_user_by_id(chat_user.id)):
+            return
+
+        await self.run_async(
             infringements.silence_user,
             user, duration, reason
         )
+        self.user_cache.invalidate_user(user.id)
 
     async def create_message(self, username: str, target: str, content: str) -> None:
         return await self.run_async(
@@ -2,6 +2,9 @@
 from discord import Interaction, app_commands
 from discord.ext.commands import *
 from app.cog import BaseCog
+from app import metrics
+
+import time
 
 class ErrorHandler(BaseCog):
     def log_unexpected_error(self, message: str, error: Exception) -> None:
@@ -21,11 +24,27 @@ class ErrorHandler(BaseCog):
 
         await interaction.response.send_message(message, ephemeral=True)
 
+    def record_error(self, command_name: str, error: Exception) -> None:
+        original_error = getattr(error, "original", error)
+        metrics.command_errors.inc(command_name, type(original_error).__name__)
+
     async def on_app_command_error(
         self,
         interaction: Interaction,
         error: app_commands.AppCommandError
     ) -> None:
+        command_name = (
+            interaction.command.qualified_name
+            if interaction.command else "unknown"
+        )
+        self.record_error(command_name, error)
+
+        if (started_at := interaction.extras.get("started_at")) is not None:
+            metrics.command_duration.observe(
+                time.perf_counter() - started_at,
+                command_name
+            )
+
         if isinstance(error, app_commands.MissingPermissions):
             return await self.send_interaction_error(
                 interaction,
@@ -61,7 +80,9 @@ class ErrorHandler(BaseCog):
         if isinstance(error, CommandNotFound):
             return
 
-        elif isinstance(error, MissingRequiredArgument):
+        self.record_error(ctx.command.qualified_name, error)
+
+        if isinstance(error, MissingRequiredArgument):
             return await ctx.send(f"Missing argument: `{error.param.name}`")
 
         elif isinstance(error, MissingPermissions):
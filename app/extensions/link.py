@@ -6,7 +6,7 @@ from discord.ext import commands
 from discord import app_commands
 
 from app.common.database.objects import DBUser
-from app.common.cache import status
+from app.cache import status
 from app.cog import BaseCog
 
 import discord
@@ -39,7 +39,7 @@ class AccountLinking(BaseCog):
                 ephemeral=True
             )
 
-        if not status.exists(target_user.id):
+        if not await status.exists(self.redis, target_user.id):
             return await interaction.response.send_message(
                 "Please log into the game and try again!",
                 ephemeral=True
@@ -1,15 +1,26 @@
 
 from app.common.config import config_instance as config
-from app.common.database.repositories import scores
-from app.common.database.objects import DBScore
 from app.common.constants import Mods
 from app.extensions.types import *
 from discord.ext.commands import Bot
 from discord.ext import commands
 from discord import Embed, Color
+from app.cache import RequestCoalescer
+from app.snapshots import Score
 from app.cog import BaseCog
+from app import queries
+from typing import List
+
+import asyncio
+import json
+
+PPRecordKey = 'banchobot:pprecord:{mods}'
 
 class PPRecord(BaseCog):
+    def __init__(self) -> None:
+        super().__init__()
+        self.coalescer = RequestCoalescer()
+
     @commands.hybrid_command("pprecord", description="Displays the current pp record")
     async def pp_record(
         self,
@@ -17,37 +28,48 @@ class PPRecord(BaseCog):
         mods: str | None = None
     ) -> None:
         mods_value = Mods.from_string(mods).value if mods else None
+        key = PPRecordKey.format(mods=mods_value if mods_value is not None else 'all')
 
-        standard = await self.fetch_pp_record(0, mods_value)
-        taiko = await self.fetch_pp_record(1, mods_value)
-        catch = await self.fetch_pp_record(2, mods_value)
-        mania = await self.fetch_pp_record(3, mods_value)
+        if cached := await self.redis.get(key):
+            records = json.loads(cached)
+        else:
+            records = await self.coalescer.run(key, lambda: self.fetch_pp_records(key, mods_value))
+
+        standard, taiko, catch, mania = records
 
         embed = Embed(title="PP Records", color=Color.blue())
-        embed.add_field(name="Standard", value=self.format_score(standard), inline=False)
-        embed.add_field(name="Taiko", value=self.format_score(taiko), inline=False)
-        embed.add_field(name="Catch", value=self.format_score(catch), inline=False)
-        embed.add_field(name="Mania", value=self.format_score(mania), inline=False)
+        embed.add_field(name="Standard", value=self.format_record(standard), inline=False)
+        embed.add_field(name="Taiko", value=self.format_record(taiko), inline=False)
+        embed.add_field(name="Catch", value=self.format_record(catch), inline=False)
+        embed.add_field(name="Mania", value=self.format_record(mania), inline=False)
         await ctx.send(embed=embed, reference=ctx.message)
 
-    async def fetch_pp_record(self, mode: int, mods: int | None = None) -> DBScore | None:
-        with self.database.managed_session() as session:
-            result = await self.run_async(
-                scores.fetch_pp_record,
-                mode, mods, True, session
-            )
+    async def fetch_pp_records(self, key: str, mods: int | None = None) -> List[dict | None]:
+        records = await asyncio.gather(*(
+            self.run_async(self.fetch_pp_record, mode, mods)
+            for mode in range(4)
+        ))
+
+        # Records are only refreshed by expiring, since new scores aren't published
+        await self.redis.set(key, json.dumps(records), ex=self.settings.PPRECORD_CACHE_TTL)
+        return records
 
-            if not result:
+    def fetch_pp_record(self, mode: int, mods: int | None = None) -> dict | None:
+        with self.database.managed_session() as session:
+            if not (result := queries.fetch_pp_record(mode, mods, session)):
                 return None
 
-            # Preload beatmap & user relationships
-            result.user
-            result.beatmap
-            result.beatmap.beatmapset
-            return result
+            return {'pp': result.pp, 'text': self.format_score(result)}
+
+    @staticmethod
+    def format_record(record: dict | None) -> str:
+        if not record:
+            return "No score for this mode :("
+
+        return record['text']
 
     @staticmethod
-    def format_score(score: DBScore) -> str:
+    def format_score(score: Score) -> str:
         if not score:
             return "No score for this mode :("
 
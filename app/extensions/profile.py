@@ -2,7 +2,7 @@
 from app.common.config import config_instance as config
 from app.common.database.objects import DBUser, DBStats
 from app.common.database.repositories import users
-from app.common.cache import leaderboards
+from app.cache import leaderboards
 from app.extensions.types import *
 from discord.ext.commands import Bot
 from discord import Embed, Color
@@ -65,8 +65,8 @@ class Profile(BaseCog):
             "rscore", "tscore",
         )
     ) -> dict:
-        return await self.run_async(
-            leaderboards.player_rankings,
+        return await leaderboards.player_rankings(
+            self.redis,
             user_id, mode, country, rankings
         )
 
@@ -2,51 +2,130 @@
 from app.common.config import config_instance as config
 from app.common.database.repositories import users
 from app.common.database.objects import DBUser
-from app.common.cache import leaderboards
 from app.common.constants import GameMode
 from app.extensions.types import *
 from discord.ext.commands import Bot
 from discord.ext import commands
 from discord import Embed, Color
-from typing import Tuple, List
+from typing import Dict, Tuple, List, get_args
+from app.cache import TTLCache, RequestCoalescer, MISSING, leaderboards
 from app.cog import BaseCog
 
+LeaderboardKeyspacePattern = '__keyspace@*__:bancho:{type}:*'
+
 class Rankings(BaseCog):
+    def __init__(self) -> None:
+        super().__init__()
+        self.cache = TTLCache(
+            self.settings.RANKINGS_CACHE_TTL,
+            self.settings.RANKINGS_CACHE_SIZE
+        )
+        self.coalescer = RequestCoalescer()
+        self.versions: Dict[Tuple[int, str], int] = {}
+
+    @property
+    def leaderboard_patterns(self) -> List[str]:
+        return [
+            LeaderboardKeyspacePattern.format(type=leaderboards.leaderboard_type(ranking_type))
+            for ranking_type in get_args(RankingType)
+        ]
+
+    async def cog_load(self) -> None:
+        if missing := await leaderboards.missing_leaderboards(self.redis, get_args(RankingType)):
+            self.logger.warning(
+                f'Leaderboards {", ".join(missing)} were not found, '
+                'their key layout might differ from app.common'
+            )
+
+        # Leaderboards are sorted sets, changes to them are published as keyspace notifications
+        for pattern in self.leaderboard_patterns:
+            self.subscriptions.psubscribe(pattern, self.on_leaderboard_update)
+
+    async def cog_unload(self) -> None:
+        for pattern in self.leaderboard_patterns:
+            self.subscriptions.punsubscribe(pattern, self.on_leaderboard_update)
+
     @commands.hybrid_command("rankings", description="Display rankings", aliases=["leaderboard", "lb"])
     async def rankings(
         self,
         ctx: commands.Context,
         mode: ModeType | None = "standard",
-        type: RankingType | None = "performance"
+        type: RankingType | None = "performance",
+        country: str | None = None,
+        page: int = 1
     ) -> None:
         target_mode = Modes.get(mode, 0)
+        country = country.lower() if country else None
+        key = (target_mode, type, country, max(page, 1))
+
+        if (embed := self.cache.get(key)) is MISSING:
+            # Identical requests share a single render
+            embed = await self.coalescer.run(key, lambda: self.render_rankings(*key))
+
+        return await ctx.send(
+            embed=Embed.from_dict(embed),
+            reference=ctx.message
+        )
+
+    async def render_rankings(self, target_mode: int, type: str, country: str | None, page: int) -> dict:
+        version = self.versions.get((target_mode, type), 0)
         mode_type = GameMode(target_mode)
+        offset = (page - 1) * 10
 
-        leaderboard = await self.fetch_top_players(target_mode, type)
+        leaderboard = await self.fetch_top_players(target_mode, type, offset, country=country)
         user_list = await self.fetch_many_users([user_id for user_id, _ in leaderboard])
         user_map = {user.id: user for user in user_list}
 
         response = ""
         extension = "pp" if type in ("performance", "ppv1") else " score"
 
-        for rank, (user_id, value) in enumerate(leaderboard, start=1):
+        for rank, (user_id, value) in enumerate(leaderboard, start=offset + 1):
             user = user_map.get(user_id)
             response += (
                 f"**#{rank} {user.name}** - {round(value)}{extension}\n" if user is not None else
                 f"**#{rank} Unknown User (ID: {user_id})** - {round(value)}{extension}\n"
             )
 
+        title = f"{type.capitalize()} Rankings for {mode_type.formatted}"
+        url = f"http://osu.{config.DOMAIN_NAME}/rankings/{type}/{mode_type.alias}"
+
+        if country:
+            title += f" ({country.upper()})"
+            url += f"?country={country}"
+
         embed = Embed(
-            title=f"{type.capitalize()} Rankings for {mode_type.formatted}",
-            url=f"http://osu.{config.DOMAIN_NAME}/rankings/{type}/{mode_type.alias}",
+            title=title,
+            url=url,
             description=response,
             color=Color.blue()
-        )
+        ).to_dict()
 
-        return await ctx.send(
-            embed=embed,
-            reference=ctx.message
-        )
+        # Don't cache a result, that was invalidated while it was being rendered
+        if self.versions.get((target_mode, type), 0) == version:
+            self.cache.set((target_mode, type, country, page), embed)
+
+        return embed
+
+    def on_leaderboard_update(self, channel: str, data: bytes) -> None:
+        # e.g. "__keyspace@0__:bancho:performance:0:de"
+        _, _, key = channel.partition('__:')
+        parts = key.split(':')
+
+        if len(parts) < 3 or not parts[2].isdigit():
+            return
+
+        mode = int(parts[2])
+
+        # Rendered rankings are cached under their /rankings type
+        for type in get_args(RankingType):
+            if leaderboards.leaderboard_type(type) != parts[1]:
+                continue
+
+            self.versions[(mode, type)] = self.versions.get((mode, type), 0) + 1
+
+            for cache_key in self.cache.keys():
+                if cache_key[:2] == (mode, type):
+                    self.cache.delete(cache_key)
 
     async def fetch_top_players(
         self,
@@ -56,8 +135,8 @@ class Rankings(BaseCog):
         range: int = 10,
         country: str | None = None
     ) -> List[Tuple[int, float]]:
-        return await self.run_async(
-            leaderboards.top_players,
+        return await leaderboards.top_players(
+            self.redis,
             mode, offset, range, type, country
         )
         
@@ -1,16 +1,18 @@
 
 from app.common.config import config_instance as config
-from app.common.database.objects import DBScore, DBUser
-from app.common.database.repositories import scores
 from app.common.constants import Mods, GameMode
 from app.common.helpers import performance
+from app.snapshots import Score, User
 from app.cog import BaseCog
+from app import queries
 
 from discord.ext.commands import Bot
 from discord.ext import commands
 from discord import Color, Embed
 from typing import List
 
+import asyncio
+
 class RecentScore(BaseCog):
     @commands.hybrid_command("recent", description="Display the last score of another player or yourself", aliases=["r", "rs", "last"])
     async def recent_score(self, ctx: commands.Context, username: str | None = None):
@@ -38,51 +40,49 @@ class RecentScore(BaseCog):
             )
 
         return await ctx.send(
-            embed=await self.render_embed(score_list[0], user),
+            embed=await self.render_embed(score_list[0], User.from_db(user)),
             reference=ctx.message
         )
 
     async def calculate_difficulty(
         self,
-        beatmap_file: bytes,
-        mode: int,
-        mods: Mods = Mods.NoMod
+        score: Score,
+        mods: Mods = Mods.NoMod,
+        beatmap_file: bytes | None = None
     ) -> performance.ppv2.DifficultyAttributes | None:
-        return await self.run_async(
-            performance.calculate_difficulty,
-            beatmap_file, mode, mods
+        return await self.performance.difficulty(
+            score.beatmap_id,
+            score.beatmap.md5,
+            score.mode, mods,
+            beatmap_file
         )
 
     async def calculate_fc_pp(
         self,
-        score: DBScore
+        score: Score,
+        beatmap_file: bytes | None = None
     ) -> float | None:
-        return await self.run_async(
-            performance.calculate_ppv2_if_fc,
-            score
-        )
+        return await self.performance.ppv2_if_fc(score, beatmap_file)
 
-    async def fetch_recent_scores(self, user_id: int, limit: int = 3) -> List[DBScore]:
+    async def fetch_recent_scores(self, user_id: int, limit: int = 3) -> List[Score]:
         with self.database.managed_session() as session:
-            response = await self.run_async(
-                scores.fetch_recent_all,
+            return await self.run_async(
+                queries.fetch_recent_scores,
                 user_id, limit, session
             )
 
-            for score in response:
-                # Preload beatmap(set) relationship
-                score.beatmap
-                score.beatmap.beatmapset
-
-            return response
-
-    async def render_embed(self, score: DBScore, user: DBUser) -> Embed:
-        beatmap_file = self.beatmaps.osu(score.beatmap_id)
+    async def render_embed(self, score: Score, user: User) -> Embed:
         mode = GameMode(score.mode)
         mods = Mods(score.mods)
 
-        beatmap_difficulty = await self.calculate_difficulty(beatmap_file, score.mode, mods)
-        fc_pp = await self.calculate_fc_pp(score)
+        beatmap_file = await self.beatmap_files.get(
+            score.beatmap_id,
+            score.beatmap.md5
+        )
+        beatmap_difficulty, fc_pp = await asyncio.gather(
+            self.calculate_difficulty(score, mods, beatmap_file),
+            self.calculate_fc_pp(score, beatmap_file)
+        )
 
         if_fc_text = ""
         mode_text = mode.formatted
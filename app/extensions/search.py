@@ -8,9 +8,19 @@ from app.common.constants import BeatmapGenre, BeatmapLanguage, BeatmapStatus
 from app.common.database.repositories import beatmapsets
 from app.common.config import config_instance as config
 from app.common.database.objects import DBBeatmapset
+from app.cache import TTLCache, RequestCoalescer, MISSING
 from app.cog import BaseCog
+from typing import List
 
 class Search(BaseCog):
+    def __init__(self) -> None:
+        super().__init__()
+        self.results = TTLCache(
+            self.settings.SEARCH_CACHE_TTL,
+            self.settings.SEARCH_CACHE_SIZE
+        )
+        self.coalescer = RequestCoalescer()
+
     @commands.hybrid_command("search", description="Search for a beatmapset")
     async def search(
         self,
@@ -18,7 +28,7 @@ class Search(BaseCog):
         *, query: str
     ) -> None:
         async with ctx.typing():
-            if not (beatmapset := await self.search_beatmapset(query)):
+            if not (embed := await self.search_beatmapset(query)):
                 return await ctx.send(
                     'No maps for this query were found.',
                     reference=ctx.message,
@@ -26,16 +36,63 @@ class Search(BaseCog):
                 )
 
             await ctx.send(
-                embed=self.create_embed(beatmapset),
-                view=NextButton(query=query, timeout=30)
+                embed=Embed.from_dict(embed),
+                view=NextButton(self, query=query, timeout=30)
             )
 
-    @classmethod
-    async def search_beatmapset(cls, query: str, offset: int = 0) -> DBBeatmapset | None:
-        return await cls.run_async(
-            beatmapsets.search_one,
-            query, offset
-        )
+    async def search_beatmapset(self, query: str, offset: int = 0, ahead: int = 0) -> dict | None:
+        """Return the rendered search result at an offset, from memory if possible
+
+        On a miss, the next `ahead` results are loaded with the same query.
+        """
+        if (embed := self.results.get((query, offset))) is MISSING:
+            embed = await self.coalescer.run(
+                (query, offset),
+                lambda: self.fetch_search_results(query, offset, ahead)
+            )
+
+        return embed
+
+    async def fetch_search_results(self, query: str, offset: int, ahead: int) -> dict | None:
+        if not self.beatmap_index.ready:
+            beatmapset = await self.run_async(
+                beatmapsets.search_one,
+                query, offset
+            )
+
+            # Empty results are cached as well, they mark the end of the results
+            embed = self.create_embed(beatmapset).to_dict() if beatmapset else None
+            self.results.set((query, offset), embed)
+            return embed
+
+        limit = offset + 1 + ahead
+        results = self.beatmap_index.search(query, limit=limit)
+        set_ids = results[offset:]
+
+        beatmapset_map = {
+            beatmapset.id: beatmapset
+            for beatmapset in await self.run_async(self.fetch_beatmapsets, set_ids)
+        } if set_ids else {}
+
+        embeds = [
+            self.create_embed(beatmapset).to_dict() if (beatmapset := beatmapset_map.get(set_id)) else None
+            for set_id in set_ids
+        ]
+
+        for index, embed in enumerate(embeds):
+            self.results.set((query, offset + index), embed)
+
+        if len(results) < limit:
+            # Empty results are cached as well, they mark the end of the results
+            self.results.set((query, max(len(results), offset)), None)
+
+        return embeds[0] if embeds else None
+
+    def fetch_beatmapsets(self, set_ids: List[int]) -> List[DBBeatmapset]:
+        with self.database.managed_session() as session:
+            return session.query(DBBeatmapset) \
+                .filter(DBBeatmapset.id.in_(set_ids)) \
+                .all()
 
     @classmethod
     def create_embed(cls, beatmapset: DBBeatmapset) -> Embed:
@@ -50,20 +107,25 @@ class Search(BaseCog):
         return embed
 
 class NextButton(View):
-    def __init__(self, *, query: str, timeout: int = 60, offset: int = 0):
+    def __init__(self, cog: Search, *, query: str, timeout: int = 60, offset: int = 0):
         super().__init__(timeout=timeout)
         self.offset = offset
         self.query = query
+        self.cog = cog
 
     @button(label='Next', style=ButtonStyle.secondary)
     async def next(self, interaction: Interaction, button: Button):
         self.offset += 1
 
-        if not (set := await Search.search_beatmapset(self.query, self.offset)):
+        if not (embed := await self.cog.search_beatmapset(
+            self.query,
+            self.offset,
+            ahead=self.cog.settings.SEARCH_PREFETCH
+        )):
             return
 
         await interaction.response.edit_message(
-            embed=Search.create_embed(set),
+            embed=Embed.from_dict(embed),
             view=self
         )
 
@@ -74,11 +136,11 @@ class NextButton(View):
 
         self.offset -= 1
 
-        if not (set := await Search.search_beatmapset(self.query, self.offset)):
+        if not (embed := await self.cog.search_beatmapset(self.query, self.offset)):
             return
 
         await interaction.response.edit_message(
-            embed=Search.create_embed(set),
+            embed=Embed.from_dict(embed),
             view=self
         )
 
@@ -1,6 +1,7 @@
 
 from discord import app_commands, Interaction, Embed
 from discord.ext.commands import Bot
+from typing import List, Tuple
 
 from app.common.config import config_instance as config
 from app.common.database.objects import DBBeatmap, DBScore
@@ -10,6 +11,23 @@ from app.common.constants import Mods
 from app.extensions.types import *
 from app.cog import BaseCog
 
+import asyncio
+
+SweepMaxPoints = 60
+SweepMaxColumns = 4
+
+ModCombinations = (
+    "NM", "EZ", "HD", "HR", "DT", "HT", "FL", "EZHD", "EZDT",
+    "HDHR", "HDDT", "HRDT", "HDFL", "HDHRDT", "HDHRFL"
+)
+
+def parse_values(text: str, type: type) -> List:
+    """Parse a comma or space separated list of numbers"""
+    return [
+        type(value)
+        for value in text.replace(",", " ").split()
+    ]
+
 class SimulateScore(BaseCog):
     @app_commands.command(name="simulate", description="Simulate pp for a beatmap")
     async def simulate_score(
@@ -33,17 +51,160 @@ class SimulateScore(BaseCog):
         target_mods = Mods.from_string(mods).value
         target_mode = Modes.get(mode, beatmap.mode)
 
+        # Workers get the file from our cache, instead of loading it on their own
+        beatmap_file = await self.beatmap_files.get(beatmap.id, beatmap.md5)
+
         difficulty = await self.calculate_difficulty(
             beatmap,
             target_mode,
-            target_mods
+            target_mods,
+            beatmap_file
+        )
+
+        simulated_score = self.create_score(
+            beatmap,
+            target_mode,
+            target_mods,
+            accuracy,
+            misses,
+            combo or beatmap.max_combo
+        )
+        result = await self.calculate_ppv2(simulated_score, beatmap_file)
+
+        embed = self.create_embed(result, difficulty, beatmap, mods)
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="sweep", description="Simulate pp for a beatmap over a range of accuracies, misses & combos")
+    async def simulate_sweep(
+        self,
+        interaction: Interaction,
+        beatmap_id: int,
+        mods: str = "NM",
+        mode: ModeType | None = None,
+        accuracies: str = "95, 97, 98, 99, 100",
+        misses: str = "0",
+        combos: str | None = None
+    ) -> None:
+        try:
+            accuracy_values = parse_values(accuracies, float)
+            miss_values = parse_values(misses, int)
+            combo_values = parse_values(combos, int) if combos else []
+        except ValueError:
+            return await interaction.response.send_message(
+                "Accuracies, misses & combos have to be lists of numbers, e.g. `95, 98, 100`.",
+                ephemeral=True
+            )
+
+        if not accuracy_values or not miss_values:
+            return await interaction.response.send_message(
+                "Please provide at least one accuracy & miss count.",
+                ephemeral=True
+            )
+
+        if any(not 0 <= accuracy <= 100 for accuracy in accuracy_values) or min(miss_values + combo_values) < 0:
+            return await interaction.response.send_message(
+                "Accuracies have to be between 0 and 100, misses & combos can't be negative.",
+                ephemeral=True
+            )
+
+        if not (beatmap := await self.resolve_beatmap(beatmap_id)):
+            return await interaction.response.send_message(
+                "I could not find that beatmap.",
+                ephemeral=True
+            )
+
+        columns = [
+            (miss_count, combo)
+            for miss_count in miss_values
+            for combo in (combo_values or [beatmap.max_combo])
+        ]
+
+        if len(columns) > SweepMaxColumns or len(columns) * len(accuracy_values) > SweepMaxPoints:
+            return await interaction.response.send_message(
+                f"Please keep it at {SweepMaxColumns} miss/combo pairs & {SweepMaxPoints} results at most.",
+                ephemeral=True
+            )
+
+        await interaction.response.defer()
+
+        target_mods = Mods.from_string(mods).value
+        target_mode = Modes.get(mode, beatmap.mode)
+        beatmap_file = await self.beatmap_files.get(beatmap.id, beatmap.md5)
+
+        points = [
+            (accuracy / 100.0, miss_count, combo)
+            for accuracy in accuracy_values
+            for miss_count, combo in columns
+        ]
+
+        # Every point is calculated in a single job, on the same worker
+        difficulty, results = await asyncio.gather(
+            self.calculate_difficulty(beatmap, target_mode, target_mods, beatmap_file),
+            self.performance.ppv2_sweep(
+                self.create_score(beatmap, target_mode, target_mods),
+                points,
+                beatmap_file
+            )
         )
 
+        embed = self.create_sweep_embed(
+            accuracy_values,
+            columns,
+            results,
+            difficulty,
+            beatmap,
+            mods
+        )
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="modcompare", description="Compare pp & star rating of a beatmap across mod combinations")
+    async def compare_mods(
+        self,
+        interaction: Interaction,
+        beatmap_id: int,
+        mode: ModeType | None = None
+    ) -> None:
+        if not (beatmap := await self.resolve_beatmap(beatmap_id)):
+            return await interaction.response.send_message(
+                "I could not find that beatmap.",
+                ephemeral=True
+            )
+
+        await interaction.response.defer()
+
+        target_mode = Modes.get(mode, beatmap.mode)
+        beatmap_file = await self.beatmap_files.get(beatmap.id, beatmap.md5)
+
+        # All combinations are calculated in one job & cached per md5
+        results = await self.performance.compare_mods(
+            self.create_score(beatmap, target_mode, 0),
+            [Mods.from_string(mods).value for mods in ModCombinations],
+            beatmap_file
+        )
+
+        embed = self.create_comparison_embed(results, beatmap)
+        await interaction.followup.send(embed=embed)
+
+    @simulate_score.autocomplete("beatmap_id")
+    @simulate_sweep.autocomplete("beatmap_id")
+    @compare_mods.autocomplete("beatmap_id")
+    async def beatmap_autocomplete(self, interaction: Interaction, current: str) -> List[app_commands.Choice[int]]:
+        return self.beatmap_choices(current)
+
+    def create_score(
+        self,
+        beatmap: DBBeatmap,
+        mode: int,
+        mods: int,
+        accuracy: float = 100.0,
+        misses: int = 0,
+        combo: int | None = None
+    ) -> DBScore:
         simulated_score = DBScore()
         simulated_score.beatmap_id = beatmap.id
         simulated_score.beatmap = beatmap
-        simulated_score.mods = target_mods
-        simulated_score.mode = target_mode
+        simulated_score.mods = mods
+        simulated_score.mode = mode
         simulated_score.acc = accuracy / 100.0
         simulated_score.nMiss = misses
         simulated_score.max_combo = combo or beatmap.max_combo
@@ -52,10 +213,7 @@ class SimulateScore(BaseCog):
         simulated_score.n50 = 0
         simulated_score.nGeki = 0
         simulated_score.nKatu = 0
-        result = await self.calculate_ppv2(simulated_score)
-
-        embed = self.create_embed(result, difficulty, beatmap, mods)
-        await interaction.followup.send(embed=embed)
+        return simulated_score
 
     async def resolve_beatmap(self, beatmap_id: int) -> DBBeatmap | None:
         return await self.run_async(
@@ -67,23 +225,22 @@ class SimulateScore(BaseCog):
         self,
         beatmap: DBBeatmap,
         mode: int,
-        mods: Mods
+        mods: Mods,
+        beatmap_file: bytes | None = None
     ) -> performance.ppv2.DifficultyAttributes:
-        return await self.run_async(
-            performance.calculate_difficulty_from_id,
+        return await self.performance.difficulty(
             beatmap.id,
-            mode,
-            mods
+            beatmap.md5,
+            mode, mods,
+            beatmap_file
         )
         
     async def calculate_ppv2(
         self,
-        score: DBScore
+        score: DBScore,
+        beatmap_file: bytes | None = None
     ) -> float | None:
-        return await self.run_async(
-            performance.calculate_ppv2,
-            score
-        )
+        return await self.performance.ppv2(score, beatmap_file)
 
     def create_embed(
         self,
@@ -113,5 +270,75 @@ class SimulateScore(BaseCog):
 
         return embed
 
+    def create_sweep_embed(
+        self,
+        accuracies: List[float],
+        columns: List[Tuple[int, int]],
+        results: List[float | None],
+        difficulty: performance.ppv2.DifficultyAttributes | None,
+        beatmap: DBBeatmap,
+        mods: str
+    ) -> Embed:
+        header = ["Acc"] + [f"{miss_count}m {combo}x" for miss_count, combo in columns]
+        rows = [
+            [f"{accuracy:.2f}%"] + [
+                f"{pp:.2f}" if pp is not None else "N/A"
+                for pp in results[index * len(columns):(index + 1) * len(columns)]
+            ]
+            for index, accuracy in enumerate(accuracies)
+        ]
+        widths = [
+            max(len(row[column]) for row in [header] + rows)
+            for column in range(len(header))
+        ]
+        table = "\n".join(
+            "  ".join(value.rjust(width) for value, width in zip(row, widths))
+            for row in [header] + rows
+        )
+
+        embed = Embed(
+            title=beatmap.full_name,
+            url=f"http://osu.{config.DOMAIN_NAME}/b/{beatmap.id}",
+            description=(
+                (f"**Stars:** {difficulty.star_rating:.2f}★\n" if difficulty else "") +
+                (f"**Mods:** +{mods}\n" if mods != "NM" else "") +
+                f"```\n{table}\n```"
+            )
+        )
+        embed.set_footer(text="Simulated Scores")
+        embed.set_thumbnail(url=self.thumbnail_url(beatmap.beatmapset))
+        return embed
+
+    def create_comparison_embed(
+        self,
+        results: List[Tuple[int, float | None, float | None]],
+        beatmap: DBBeatmap
+    ) -> Embed:
+        rows = [["Mods", "Stars", "PP"]] + [
+            [
+                Mods(mods).short or "NM",
+                f"{stars:.2f}" if stars is not None else "N/A",
+                f"{pp:.2f}" if pp is not None else "N/A"
+            ]
+            for mods, stars, pp in sorted(results, key=lambda result: -(result[2] or 0))
+        ]
+        widths = [
+            max(len(row[column]) for row in rows)
+            for column in range(3)
+        ]
+        table = "\n".join(
+            "  ".join(value.rjust(width) for value, width in zip(row, widths))
+            for row in rows
+        )
+
+        embed = Embed(
+            title=beatmap.full_name,
+            url=f"http://osu.{config.DOMAIN_NAME}/b/{beatmap.id}",
+            description=f"```\n{table}\n```"
+        )
+        embed.set_footer(text="Simulated SS scores")
+        embed.set_thumbnail(url=self.thumbnail_url(beatmap.beatmapset))
+        return embed
+
 async def setup(bot: Bot):
     await bot.add_cog(SimulateScore())
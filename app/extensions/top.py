@@ -1,15 +1,17 @@
 
 from app.common.config import config_instance as config
-from app.common.database.objects import DBScore, DBUser
-from app.common.database.repositories import scores
 from app.common.constants import Mods, GameMode
 from app.extensions.types import *
 from discord.ext.commands import Bot
 from discord.ext import commands
 from discord import Color, Embed
+from app.snapshots import Score, User
 from app.cog import BaseCog
+from app import queries
 from typing import List
 
+import asyncio
+
 class TopScores(BaseCog):
     @commands.hybrid_command("top", description="Display the top plays of you or another player", aliases=["scores", "best"])
     async def top_scores(
@@ -34,6 +36,7 @@ class TopScores(BaseCog):
                 reference=ctx.message
             )
 
+        user = User.from_db(user)
         target_mode = user.preferred_mode
 
         if mode is not None:
@@ -56,27 +59,47 @@ class TopScores(BaseCog):
                 reference=ctx.message
             )
 
+        fc_pp = await self.calculate_fc_pp(user_scores)
+
         return await ctx.send(
-            embed=self.render_embed(user_scores, user),
+            embed=self.render_embed(user_scores, fc_pp, user),
             reference=ctx.message
         )
 
-    async def fetch_top_scores(self, user_id: int, mode: int, limit: int = 100) -> List[DBScore]:
-        with self.database.managed_session() as session:
-            user_scores = await self.run_async(
-                scores.fetch_top_scores,
-                user_id, mode, True,
-                limit, 0, session
-            )
+    async def calculate_fc_pp(self, user_scores: List[Score]) -> List[float | None]:
+        if not (imperfect_scores := [score for score in user_scores if not score.perfect]):
+            return [None] * len(user_scores)
+
+        beatmaps = {score.beatmap_id: score.beatmap.md5 for score in imperfect_scores}
+        beatmap_files = await asyncio.gather(*(
+            self.beatmap_files.get(beatmap_id, md5)
+            for beatmap_id, md5 in beatmaps.items()
+        ))
 
-            for score in user_scores:
-                # Preload beatmap(set) relationships
-                score.beatmap
-                score.beatmap.beatmapset
+        # One job for all scores, where every beatmap is parsed once
+        results = iter(await self.performance.ppv2_if_fc_batch(
+            imperfect_scores,
+            dict(zip(beatmaps, beatmap_files))
+        ))
 
-            return user_scores
+        return [
+            next(results) if not score.perfect else None
+            for score in user_scores
+        ]
+
+    async def fetch_top_scores(self, user_id: int, mode: int, limit: int = 100) -> List[Score]:
+        with self.database.managed_session() as session:
+            return await self.run_async(
+                queries.fetch_top_scores,
+                user_id, mode, limit, session
+            )
         
-    def render_embed(self, user_scores: List[DBScore], user: DBUser) -> Embed:
+    def render_embed(
+        self,
+        user_scores: List[Score],
+        fc_pp: List[float | None],
+        user: User
+    ) -> Embed:
         embed = Embed(
             title=f"Top plays for {user.name}",
             url=f"http://osu.{config.DOMAIN_NAME}/u/{user.id}#leader",
@@ -85,14 +108,15 @@ class TopScores(BaseCog):
         )
         embed.set_thumbnail(url=f"http://osu.{config.DOMAIN_NAME}/a/{user.id}?h=50")
 
-        for position, score in enumerate(user_scores, start=1):
+        for position, (score, score_fc_pp) in enumerate(zip(user_scores, fc_pp), start=1):
             mods = Mods(score.mods)
+            if_fc_text = f" ({score_fc_pp:.2f}pp if FC)" if score_fc_pp is not None else ""
             beatmap_title = f"{score.beatmap.full_name} +{mods}"
             embed.description += f"{position}. {beatmap_title}\n"
             embed.description += (
                 f"   {score.grade} {score.max_combo}/{score.beatmap.max_combo} "
                 f"{score.acc*100:.2f}% [{score.n300}/{score.n100}/{score.n50}/{score.nMiss}] "
-                f"{score.pp:.2f}pp\n"
+                f"{score.pp:.2f}pp{if_fc_text}\n"
             )
 
         return embed
@@ -0,0 +1,120 @@
+
+from typing import Dict, NamedTuple
+from multidict import CIMultiDictProxy
+from app import metrics
+
+import logging
+import aiohttp
+import asyncio
+import random
+
+RetryStatusCodes = frozenset({429, 500, 502, 503, 504})
+MaxRetryDelay = 30
+
+class HttpResponse(NamedTuple):
+    status: int
+    headers: CIMultiDictProxy
+    content: bytes
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise HttpError(self.status)
+
+class HttpError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(f'Request failed with status code {status}')
+        self.status = status
+
+class HttpClient:
+    """Shared asyncio http client, with a keep-alive pool & retries"""
+
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        timeout: float,
+        connections: int,
+        connections_per_host: int,
+        retries: int,
+        backoff: float
+    ) -> None:
+        self.logger = logging.getLogger('http')
+        self.session: aiohttp.ClientSession | None = None
+        self.connections_per_host = connections_per_host
+        self.connections = connections
+        self.timeout = timeout
+        self.headers = headers
+        self.retries = retries
+        self.backoff = backoff
+
+    def client(self) -> aiohttp.ClientSession:
+        # The session has to be created inside of the running event loop
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(
+                    limit=self.connections,
+                    limit_per_host=self.connections_per_host
+                )
+            )
+
+        return self.session
+
+    async def request(self, method: str, url: str, **kwargs) -> HttpResponse:
+        """Perform a request, retrying on connection errors & temporary failures"""
+        for attempt in range(self.retries + 1):
+            try:
+                with metrics.roundtrip('http'):
+                    response = await self.perform(method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    raise
+
+                self.logger.warning(f'{method} {url} failed ({e}), retrying...')
+                await self.wait(attempt)
+                continue
+
+            if response.status not in RetryStatusCodes or attempt >= self.retries:
+                return response
+
+            self.logger.warning(f'{method} {url} returned {response.status}, retrying...')
+            await self.wait(attempt, response.headers.get('Retry-After'))
+
+        return response
+
+    async def perform(self, method: str, url: str, **kwargs) -> HttpResponse:
+        async with self.client().request(method, url, **kwargs) as response:
+            return HttpResponse(
+                response.status,
+                response.headers,
+                await response.read()
+            )
+
+    async def wait(self, attempt: int, retry_after: str | None = None) -> None:
+        if retry_after and retry_after.isdigit():
+            # Don't let a misbehaving server park us for hours
+            return await asyncio.sleep(min(int(retry_after), MaxRetryDelay))
+
+        # Exponential backoff with jitter
+        delay = min(self.backoff * (2 ** attempt), MaxRetryDelay)
+        await asyncio.sleep(delay + random.uniform(0, delay))
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request('GET', url, **kwargs)
+
+    async def head(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request('HEAD', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self) -> None:
+        if self.session is None:
+            return
+
+        await self.session.close()
+        self.session = None
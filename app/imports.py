@@ -0,0 +1,211 @@
+
+from app.common.database.objects import DBBeatmapset
+from redis.asyncio import Redis as RedisAsync
+from dataclasses import dataclass, asdict
+from typing import List
+
+import uuid
+import json
+
+@dataclass(frozen=True)
+class ImportOptions:
+    round_decimal_values: bool = True
+    fix_leadin_times: bool = True
+    fix_perfect_curves: bool = True
+    move_to_pending: bool = True
+
+@dataclass(frozen=True)
+class ImportJob:
+    batch_id: str
+    beatmapset_id: int
+    options: ImportOptions
+
+    def serialize(self) -> str:
+        return json.dumps({
+            'batch_id': self.batch_id,
+            'beatmapset_id': self.beatmapset_id,
+            'options': asdict(self.options)
+        })
+
+    @classmethod
+    def deserialize(cls, payload: bytes | str) -> "ImportJob":
+        data = json.loads(payload)
+        return cls(
+            batch_id=data['batch_id'],
+            beatmapset_id=data['beatmapset_id'],
+            options=ImportOptions(**data['options'])
+        )
+
+@dataclass(frozen=True)
+class ImportResult:
+    beatmapset: DBBeatmapset
+    decimal_updates: int = 0
+    leadin_updates: int = 0
+    curve_updates: int = 0
+
+@dataclass
+class ImportBatch:
+    id: str
+    channel_id: int
+    message_id: int
+    total: int
+    added: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.added + self.skipped + self.failed
+
+    @property
+    def finished(self) -> bool:
+        return self.processed >= self.total
+
+class ImportQueue:
+    """Durable queue of beatmapset imports, that survives restarts of the bot
+
+    Jobs are moved from the pending list into the processing list of their
+    owner, while one of its workers is busy with them. Every owner holds a
+    lease, that it keeps renewing while it is alive. Jobs of owners whose
+    lease expired were interrupted, and are put back into the pending list.
+    """
+
+    def __init__(self, redis: RedisAsync, expiry: int, lease: int = 30, prefix: str = 'banchobot:imports') -> None:
+        self.redis = redis
+        self.expiry = expiry
+        self.lease = lease
+        self.prefix = prefix
+        self.pending = f'{prefix}:pending'
+        self.owners = f'{prefix}:owners'
+
+    def processing_key(self, owner: str) -> str:
+        return f'{self.prefix}:processing:{owner}'
+
+    def lease_key(self, owner: str) -> str:
+        return f'{self.prefix}:leases:{owner}'
+
+    def batch_key(self, batch_id: str) -> str:
+        return f'{self.prefix}:batches:{batch_id}'
+
+    def errors_key(self, batch_id: str) -> str:
+        return f'{self.prefix}:batches:{batch_id}:errors'
+
+    def lock(self, beatmapset_id: int, timeout: int):
+        """Distributed lock, so that a set is never imported twice at once"""
+        return self.redis.lock(
+            f'{self.prefix}:locks:{beatmapset_id}',
+            timeout=timeout,
+            blocking=False
+        )
+
+    async def create_batch(self, channel_id: int, message_id: int, total: int) -> ImportBatch:
+        batch = ImportBatch(uuid.uuid4().hex, channel_id, message_id, total)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.batch_key(batch.id), mapping={
+                'channel_id': channel_id,
+                'message_id': message_id,
+                'total': total,
+                'added': 0,
+                'skipped': 0,
+                'failed': 0
+            })
+            pipe.expire(self.batch_key(batch.id), self.expiry)
+            await pipe.execute()
+
+        return batch
+
+    async def batch(self, batch_id: str) -> ImportBatch | None:
+        if not (data := await self.redis.hgetall(self.batch_key(batch_id))):
+            return None
+
+        return ImportBatch(
+            id=batch_id,
+            **{key.decode(): int(value) for key, value in data.items()}
+        )
+
+    async def enqueue(self, batch: ImportBatch, beatmapset_ids: List[int], options: ImportOptions) -> None:
+        await self.redis.rpush(self.pending, *(
+            ImportJob(batch.id, beatmapset_id, options).serialize()
+            for beatmapset_id in beatmapset_ids
+        ))
+
+    async def register(self) -> str:
+        """Create a new owner for a group of workers & take out its first lease"""
+        owner = uuid.uuid4().hex
+        await self.renew(owner)
+        return owner
+
+    async def renew(self, owner: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.lease_key(owner), 1, ex=self.lease)
+            pipe.sadd(self.owners, owner)
+            await pipe.execute()
+
+    async def release(self, owner: str) -> int:
+        """Give back the jobs of an owner, whose workers have all stopped"""
+        released = await self.requeue(owner)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.lease_key(owner))
+            pipe.srem(self.owners, owner)
+            await pipe.execute()
+
+        return released
+
+    async def next(self, owner: str, timeout: int) -> tuple[ImportJob, bytes] | None:
+        payload = await self.redis.blmove(
+            self.pending,
+            self.processing_key(owner),
+            timeout,
+            'LEFT', 'RIGHT'
+        )
+
+        if payload is None:
+            return None
+
+        return ImportJob.deserialize(payload), payload
+
+    async def complete(self, owner: str, payload: bytes) -> None:
+        await self.redis.lrem(self.processing_key(owner), 1, payload)
+
+    async def record(self, job: ImportJob, outcome: str, error: str | None = None) -> ImportBatch | None:
+        """Count the outcome ('added', 'skipped' or 'failed') of a job towards its batch"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(self.batch_key(job.batch_id), outcome, 1)
+
+            if error:
+                pipe.rpush(self.errors_key(job.batch_id), f'{job.beatmapset_id}: {error}')
+                pipe.ltrim(self.errors_key(job.batch_id), -10, -1)
+                pipe.expire(self.errors_key(job.batch_id), self.expiry)
+
+            await pipe.execute()
+
+        return await self.batch(job.batch_id)
+
+    async def errors(self, batch_id: str) -> List[str]:
+        return [error.decode() for error in await self.redis.lrange(self.errors_key(batch_id), 0, -1)]
+
+    async def resume(self) -> int:
+        """Move the jobs of owners with an expired lease back into the pending queue"""
+        resumed = 0
+
+        for owner in await self.redis.smembers(self.owners):
+            owner = owner.decode()
+
+            if await self.redis.exists(self.lease_key(owner)):
+                continue
+
+            resumed += await self.requeue(owner)
+            await self.redis.srem(self.owners, owner)
+
+        return resumed
+
+    async def requeue(self, owner: str) -> int:
+        requeued = 0
+
+        # Every job is moved atomically, so two processes can't both requeue it
+        while await self.redis.lmove(self.processing_key(owner), self.pending, 'RIGHT', 'LEFT'):
+            requeued += 1
+
+        return requeued
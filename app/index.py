@@ -0,0 +1,311 @@
+
+from app.common.database.objects import DBBeatmapset, DBBeatmap
+from app.common.database import Postgres
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+from collections import defaultdict
+from app.executors import WorkloadExecutor
+
+import asyncio
+import logging
+import heapq
+import time
+
+EmptyPostings: Set[int] = frozenset()
+MinimumSuggestionLength = 2
+
+class IndexTables(NamedTuple):
+    sets: Dict[int, "IndexedBeatmapset"]
+    beatmaps: Dict[int, int]
+    postings: Dict[str, Set[int]]
+    title_postings: Dict[str, Set[int]]
+    titles: Dict[str, Set[int]]
+
+class IndexedBeatmapset(NamedTuple):
+    id: int
+    title: str
+    artist: str
+    creator: str
+    normalized_title: str
+    words: Tuple[str, ...]
+    beatmaps: Tuple[Tuple[int, str], ...]
+
+def normalize(text: str | None) -> List[str]:
+    return (text or '').lower().split()
+
+def word_trigrams(word: str, prefix: bool = False) -> Iterable[str]:
+    """Trigrams of a word, padded like in pg_trgm, so that short prefixes can be looked up"""
+    padded = f'  {word}' if prefix else f'  {word} '
+    return (padded[index:index + 3] for index in range(len(padded) - 2))
+
+class BeatmapIndex:
+    """In-memory trigram index over the metadata of all beatmapsets
+
+    Every query word is matched against the start of the words in the title,
+    artist, creator & tags. The trigrams only narrow down the candidates,
+    which are then verified against their words. The first word of every
+    title is indexed separately, so that title matches can be ranked first
+    without looking at every candidate.
+    """
+
+    def __init__(self, database: Postgres, executor: WorkloadExecutor) -> None:
+        self.logger = logging.getLogger('beatmap-index')
+        self.sets: Dict[int, IndexedBeatmapset] = {}
+        self.beatmaps: Dict[int, int] = {}
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.title_postings: Dict[str, Set[int]] = defaultdict(set)
+        self.titles: Dict[str, Set[int]] = defaultdict(set)
+        self.stale: Set[int] | None = None
+        self.executor = executor
+        self.database = database
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self.sets)
+
+    async def build(self) -> None:
+        """Load all beatmapsets & replace the current index"""
+        start = time.perf_counter()
+
+        # Beatmapsets that change while building are reloaded after the swap,
+        # since the new tables could have been loaded before the change
+        self.stale = set()
+
+        try:
+            tables = await self.executor.run(self.load)
+        except Exception as e:
+            self.stale = None
+            return self.logger.error(f'Failed to build beatmap index: {e}', exc_info=e)
+
+        # Only the swap happens on the event loop
+        stale, self.stale = self.stale, None
+        self.sets, self.beatmaps, self.postings, self.title_postings, self.titles = tables
+        self.ready = True
+
+        for set_id in stale:
+            await self.refresh(set_id)
+
+        self.logger.info(
+            f'Indexed {len(self.sets)} beatmapsets in '
+            f'{time.perf_counter() - start:.2f} seconds'
+        )
+
+    async def refresh(self, set_id: int) -> None:
+        """Reload a single beatmapset, e.g. after it was added, changed or deleted"""
+        entries = await self.executor.run(self.fetch_entries, set_id)
+        self.remove(set_id)
+
+        for entry in entries:
+            self.insert(entry, self.tables)
+
+    @property
+    def tables(self) -> IndexTables:
+        return IndexTables(self.sets, self.beatmaps, self.postings, self.title_postings, self.titles)
+
+    def load(self) -> IndexTables:
+        """Fetch all beatmapsets & build new tables, without touching the current ones"""
+        tables = IndexTables({}, {}, defaultdict(set), defaultdict(set), defaultdict(set))
+
+        for entry in self.fetch_entries():
+            self.insert(entry, tables)
+
+        return tables
+
+    async def run(self, interval: int) -> None:
+        """Rebuild the index periodically, to pick up changes made outside of the bot"""
+        while True:
+            await self.build()
+            await asyncio.sleep(interval)
+
+    def fetch_entries(self, set_id: int | None = None) -> List[IndexedBeatmapset]:
+        with self.database.managed_session() as session:
+            set_query = session.query(
+                DBBeatmapset.id,
+                DBBeatmapset.title,
+                DBBeatmapset.artist,
+                DBBeatmapset.creator,
+                DBBeatmapset.tags
+            )
+            beatmap_query = session.query(
+                DBBeatmap.id,
+                DBBeatmap.set_id,
+                DBBeatmap.version
+            )
+
+            if set_id is not None:
+                set_query = set_query.filter(DBBeatmapset.id == set_id)
+                beatmap_query = beatmap_query.filter(DBBeatmap.set_id == set_id)
+
+            versions = defaultdict(list)
+
+            for beatmap_id, beatmap_set_id, version in beatmap_query.yield_per(10000):
+                versions[beatmap_set_id].append((beatmap_id, version))
+
+            return [
+                IndexedBeatmapset(
+                    id, title, artist, creator,
+                    normalized_title=' '.join(normalize(title)),
+                    words=tuple(dict.fromkeys(
+                        normalize(title) + normalize(artist) +
+                        normalize(creator) + normalize(tags)
+                    )),
+                    beatmaps=tuple(versions.get(id, ()))
+                )
+                for id, title, artist, creator, tags in set_query.yield_per(10000)
+            ]
+
+    @staticmethod
+    def insert(entry: IndexedBeatmapset, tables: IndexTables) -> None:
+        tables.sets[entry.id] = entry
+
+        for beatmap_id, _ in entry.beatmaps:
+            tables.beatmaps[beatmap_id] = entry.id
+
+        for word in entry.words:
+            for trigram in word_trigrams(word):
+                tables.postings[trigram].add(entry.id)
+
+        for word in entry.normalized_title.split()[:1]:
+            for trigram in word_trigrams(word):
+                tables.title_postings[trigram].add(entry.id)
+
+        tables.titles[entry.normalized_title].add(entry.id)
+
+    def remove(self, set_id: int) -> None:
+        if self.stale is not None:
+            self.stale.add(set_id)
+
+        if not (entry := self.sets.pop(set_id, None)):
+            return
+
+        for beatmap_id, _ in entry.beatmaps:
+            self.beatmaps.pop(beatmap_id, None)
+
+        self.discard(set_id, entry.words, self.postings)
+        self.discard(set_id, entry.normalized_title.split()[:1], self.title_postings)
+
+        if titles := self.titles.get(entry.normalized_title):
+            titles.discard(set_id)
+
+            if not titles:
+                del self.titles[entry.normalized_title]
+
+    @staticmethod
+    def discard(set_id: int, words: Iterable[str], postings: Dict[str, Set[int]]) -> None:
+        for word in words:
+            for trigram in word_trigrams(word):
+                if (posting := postings.get(trigram)) is None:
+                    continue
+
+                posting.discard(set_id)
+
+                if not posting:
+                    del postings[trigram]
+
+    @staticmethod
+    def candidates(words: List[str], postings: Dict[str, Set[int]]) -> Set[int]:
+        # The second trigram of a padded word (" ab") already implies the
+        # first one ("  a"), which is by far the longest posting list
+        trigrams = {
+            trigram
+            for word in words
+            for trigram in list(word_trigrams(word, prefix=True))[len(word) > 1:]
+        }
+
+        # Intersect the smallest posting lists first
+        posting_lists = sorted(
+            (postings.get(trigram, EmptyPostings) for trigram in trigrams),
+            key=len
+        )
+
+        if len(posting_lists) == 1:
+            # Never handed out for modification
+            return posting_lists[0]
+
+        result = posting_lists[0] & posting_lists[1]
+
+        for posting in posting_lists[2:]:
+            if not result:
+                break
+
+            result &= posting
+
+        return result
+
+    def search(self, query: str, limit: int | None = None) -> List[int]:
+        """Return the ids of all matching beatmapsets, best matches first"""
+        if not (words := normalize(query)):
+            return []
+
+        candidates = self.candidates(words, self.postings)
+
+        if long_words := [word for word in words if len(word) > 2]:
+            # Words of up to two letters are fully covered by their leading trigrams
+            candidates = {
+                set_id for set_id in candidates
+                if all(
+                    any(candidate.startswith(word) for candidate in self.sets[set_id].words)
+                    for word in long_words
+                )
+            }
+
+        # Exact title matches first, then titles starting with the first word,
+        # then everything else. The most recent sets come first in every tier.
+        exact_matches = self.titles.get(' '.join(words), EmptyPostings) & candidates
+        title_matches = self.candidates(words[:1], self.title_postings) & candidates
+
+        if len(words[0]) > 2:
+            title_matches = {
+                set_id for set_id in title_matches
+                if self.sets[set_id].normalized_title.startswith(words[0])
+            }
+
+        results = []
+
+        # Tiers are only computed as far as they are needed. Set operations &
+        # heapq work on the ids directly, without calling back into python.
+        for tier in (
+            lambda: exact_matches,
+            lambda: title_matches - exact_matches,
+            lambda: candidates - title_matches - exact_matches
+        ):
+            if limit is None:
+                results += sorted(tier(), reverse=True)
+                continue
+
+            results += heapq.nlargest(limit - len(results), tier())
+
+            if len(results) >= limit:
+                break
+
+        return results
+
+    def suggest_beatmapsets(self, query: str, limit: int = 25) -> List[IndexedBeatmapset]:
+        if query.isdigit() and (entry := self.sets.get(int(query))):
+            return [entry]
+
+        if len(query.strip()) < MinimumSuggestionLength:
+            return []
+
+        return [self.sets[set_id] for set_id in self.search(query, limit)]
+
+    def suggest_beatmaps(self, query: str, limit: int = 25) -> List[Tuple[int, str]]:
+        if query.isdigit() and (set_id := self.beatmaps.get(int(query))):
+            entry = self.sets[set_id]
+            version = dict(entry.beatmaps)[int(query)]
+            return [(int(query), f'{entry.artist} - {entry.title} [{version}]')]
+
+        if len(query.strip()) < MinimumSuggestionLength:
+            return []
+
+        suggestions = []
+
+        for set_id in self.search(query, limit):
+            entry = self.sets[set_id]
+
+            for beatmap_id, version in entry.beatmaps:
+                suggestions.append((beatmap_id, f'{entry.artist} - {entry.title} [{version}]'))
+
+            if len(suggestions) >= limit:
+                break
+
+        return suggestions[:limit]
@@ -0,0 +1,293 @@
+
+from typing import Callable, Dict, Iterator, List, Tuple, Any
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy.engine import Engine
+from sqlalchemy import event
+from aiohttp import web
+
+import threading
+import logging
+import time
+
+current_command: ContextVar[str | None] = ContextVar('current_command', default=None)
+current_queries: ContextVar["QueryCounter | None"] = ContextVar('current_queries', default=None)
+
+DefaultBuckets = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+QueryBuckets = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    labels = [
+        f'{name}="{escape_label(value)}"'
+        for name, value in zip(names, values)
+    ]
+
+    if extra:
+        labels.append(extra)
+
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} counter'
+        ]
+
+        with self.lock:
+            for labels, value in self.values.items():
+                lines.append(f'{self.name}{format_labels(self.labels, labels)} {value}')
+
+        return lines
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DefaultBuckets
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self.lock:
+            counts, total, count = self.values.get(
+                labels,
+                ([0] * len(self.buckets), 0.0, 0)
+            )
+
+            for index, bucket in enumerate(self.buckets):
+                if value <= bucket:
+                    counts[index] += 1
+
+            self.values[labels] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} histogram'
+        ]
+
+        with self.lock:
+            for labels, (counts, total, count) in self.values.items():
+                for bucket, bucket_count in zip(self.buckets, counts):
+                    bucket_labels = format_labels(self.labels, labels, f'le="{bucket}"')
+                    lines.append(f'{self.name}_bucket{bucket_labels} {bucket_count}')
+
+                inf_labels = format_labels(self.labels, labels, 'le="+Inf"')
+                lines.append(f'{self.name}_bucket{inf_labels} {count}')
+                lines.append(f'{self.name}_sum{format_labels(self.labels, labels)} {total}')
+                lines.append(f'{self.name}_count{format_labels(self.labels, labels)} {count}')
+
+        return lines
+
+class Gauge:
+    """Gauge, whose values are collected from a callback on every scrape"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Tuple[str, ...],
+        collect: Callable[[], Dict[Tuple[str, ...], float]]
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} gauge'
+        ]
+
+        for labels, value in self.collect().items():
+            lines.append(f'{self.name}{format_labels(self.labels, labels)} {value}')
+
+        return lines
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: List[Counter | Histogram | Gauge] = []
+
+    def register(self, metric: Any) -> Any:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+
+        for metric in self.metrics:
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+command_duration = registry.register(Histogram(
+    'banchobot_command_duration_seconds',
+    'Wall time of commands & listeners',
+    ('command',)
+))
+executor_wait = registry.register(Histogram(
+    'banchobot_executor_wait_seconds',
+    'Time spent waiting for a free worker in an executor pool',
+    ('pool', 'command')
+))
+roundtrip_duration = registry.register(Histogram(
+    'banchobot_roundtrip_duration_seconds',
+    'Duration of database, redis & http round trips',
+    ('backend', 'command')
+))
+command_errors = registry.register(Counter(
+    'banchobot_command_errors_total',
+    'Errors handled by the error handler',
+    ('command', 'error')
+))
+
+command_queries = registry.register(Histogram(
+    'banchobot_command_queries',
+    'Database queries executed per command invocation',
+    ('command',),
+    buckets=QueryBuckets
+))
+
+class QueryCounter:
+    """Number of queries executed on behalf of a single command invocation"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def increment(self) -> None:
+        with self.lock:
+            self.count += 1
+
+def count_queries() -> QueryCounter:
+    """Start counting the queries of the current invocation"""
+    counter = QueryCounter()
+    current_queries.set(counter)
+    return counter
+
+def command_label() -> str:
+    return current_command.get() or 'none'
+
+@contextmanager
+def track_command(name: str) -> Iterator[None]:
+    """Attribute everything inside this block to a command & record its wall time"""
+    token = current_command.set(name)
+
+    try:
+        with command_duration.time(name):
+            yield
+    finally:
+        current_command.reset(token)
+
+@contextmanager
+def roundtrip(backend: str) -> Iterator[None]:
+    with roundtrip_duration.time(backend, command_label()):
+        yield
+
+def timed(backend: str, func: Callable) -> Callable:
+    """Wrap a blocking function, so that its duration counts as a round trip"""
+    def wrapper(*args, **kwargs):
+        with roundtrip(backend):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+def instrument_engine(engine: Engine) -> None:
+    """Record the duration & number of every query executed by this engine"""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        roundtrip_duration.observe(
+            time.perf_counter() - context.metrics_started,
+            'database', command_label()
+        )
+
+        if (counter := current_queries.get()) is not None:
+            counter.increment()
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+def instrument_requests(session: Any) -> None:
+    """Record the duration of every request made by a `requests.Session`"""
+    def on_response(response, *args, **kwargs):
+        roundtrip_duration.observe(
+            response.elapsed.total_seconds(),
+            'http', command_label()
+        )
+
+    session.hooks['response'].append(on_response)
+
+class MetricsServer:
+    """Serves the registry in the prometheus text format"""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.logger = logging.getLogger('metrics')
+        self.runner: web.AppRunner | None = None
+        self.host = host
+        self.port = port
+
+    async def start(self) -> None:
+        if self.runner is not None:
+            return
+
+        application = web.Application()
+        application.router.add_get('/metrics', self.handle_metrics)
+
+        self.runner = web.AppRunner(application, access_log=None)
+        await self.runner.setup()
+
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.logger.info(f'Serving metrics on http://{self.host}:{self.port}/metrics')
+
+    async def stop(self) -> None:
+        if self.runner is None:
+            return
+
+        await self.runner.cleanup()
+        self.runner = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
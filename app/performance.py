@@ -0,0 +1,391 @@
+
+from app.common.database.objects import DBScore, DBBeatmap
+from app.common.helpers.performance import ppv2, ppv2_native
+from app.common.helpers.beatmaps import BeatmapResources
+from app.common.helpers import performance
+from app.common.constants import Mods
+from app.cache.difficulty import DifficultyCache, difficulty_mods
+from app.cache.coalesce import RequestCoalescer
+from app.snapshots import Score
+
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, replace
+from typing import Callable, Any, Dict, List, Tuple
+
+import multiprocessing
+import logging
+import asyncio
+
+@dataclass(frozen=True)
+class PerformanceJob:
+    """A picklable description of a score, that can be sent to a pp worker"""
+    beatmap_id: int
+    beatmap_md5: str | None
+    mode: int
+    mods: int = 0
+    acc: float = 1.0
+    max_combo: int = 0
+    n300: int = 0
+    n100: int = 0
+    n50: int = 0
+    nMiss: int = 0
+    nGeki: int = 0
+    nKatu: int = 0
+    perfect: bool | None = None
+    beatmap_max_combo: int = 0
+    count_normal: int = 0
+    count_slider: int = 0
+    count_spinner: int = 0
+    beatmap_file: bytes | None = None
+
+    @classmethod
+    def from_score(cls, score: DBScore | Score, beatmap_file: bytes | None = None) -> "PerformanceJob":
+        return cls(
+            beatmap_id=score.beatmap_id,
+            beatmap_md5=score.beatmap.md5,
+            mode=score.mode,
+            mods=score.mods,
+            acc=score.acc,
+            max_combo=score.max_combo,
+            n300=score.n300,
+            n100=score.n100,
+            n50=score.n50,
+            nMiss=score.nMiss,
+            nGeki=score.nGeki,
+            nKatu=score.nKatu,
+            perfect=score.perfect,
+            beatmap_max_combo=score.beatmap.max_combo,
+            count_normal=score.beatmap.count_normal,
+            count_slider=score.beatmap.count_slider,
+            count_spinner=score.beatmap.count_spinner,
+            beatmap_file=beatmap_file
+        )
+
+    def to_score(self) -> DBScore:
+        beatmap = DBBeatmap()
+        beatmap.id = self.beatmap_id
+        beatmap.md5 = self.beatmap_md5
+        beatmap.mode = self.mode
+        beatmap.max_combo = self.beatmap_max_combo
+        beatmap.count_normal = self.count_normal
+        beatmap.count_slider = self.count_slider
+        beatmap.count_spinner = self.count_spinner
+
+        score = DBScore()
+        score.beatmap_id = self.beatmap_id
+        score.beatmap = beatmap
+        score.mode = self.mode
+        score.mods = self.mods
+        score.acc = self.acc
+        score.max_combo = self.max_combo
+        score.n300 = self.n300
+        score.n100 = self.n100
+        score.n50 = self.n50
+        score.nMiss = self.nMiss
+        score.nGeki = self.nGeki
+        score.nKatu = self.nKatu
+        score.perfect = self.perfect
+        return score
+
+class WorkerBeatmapCache:
+    """LRU of .osu files in front of the beatmap resources of a single pp worker"""
+
+    def __init__(self, resources: BeatmapResources, size: int) -> None:
+        self.resources = resources
+        self.entries: OrderedDict[int, tuple[str | None, bytes]] = OrderedDict()
+        self.size = size
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resources, name)
+
+    def osu(self, beatmap_id: int, md5: str | None = None) -> bytes | None:
+        if (entry := self.entries.get(beatmap_id)) is not None:
+            cached_md5, content = entry
+
+            if md5 is None or cached_md5 is None or cached_md5 == md5:
+                self.entries.move_to_end(beatmap_id)
+                return content
+
+        if not (content := self.resources.osu(beatmap_id)):
+            return None
+
+        self.store(beatmap_id, md5, content)
+        return content
+
+    def store(self, beatmap_id: int, md5: str | None, content: bytes) -> None:
+        self.entries[beatmap_id] = (md5, content)
+        self.entries.move_to_end(beatmap_id)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+worker_cache: WorkerBeatmapCache | None = None
+
+def initialize_worker(cache_size: int) -> None:
+    global worker_cache
+    from app.common.config import config_instance as config
+    from app.common.storage import Storage
+    from redis import Redis
+
+    # Workers only need the beatmap resources, not a full bot session
+    resources = BeatmapResources(
+        Storage(config),
+        Redis(config.REDIS_HOST, config.REDIS_PORT)
+    )
+
+    # Every worker keeps its own calculator instance warm
+    worker_cache = WorkerBeatmapCache(resources, cache_size)
+    calculator = ppv2_native.NativePerformanceCalculator(worker_cache)
+    ppv2.initialize_calculator(calculator)
+
+def resolve_beatmap_file(job: PerformanceJob) -> bytes | None:
+    if job.beatmap_file is None:
+        return worker_cache.osu(job.beatmap_id, job.beatmap_md5)
+
+    worker_cache.store(job.beatmap_id, job.beatmap_md5, job.beatmap_file)
+    return job.beatmap_file
+
+def calculate_difficulty(job: PerformanceJob) -> ppv2.DifficultyAttributes | None:
+    if not (beatmap_file := resolve_beatmap_file(job)):
+        return None
+
+    return performance.calculate_difficulty(
+        beatmap_file,
+        job.mode,
+        Mods(job.mods)
+    )
+
+def calculate_ppv2(job: PerformanceJob) -> float | None:
+    if not resolve_beatmap_file(job):
+        return None
+
+    return performance.calculate_ppv2(job.to_score())
+
+def calculate_ppv2_if_fc(job: PerformanceJob) -> float | None:
+    if not resolve_beatmap_file(job):
+        return None
+
+    return performance.calculate_ppv2_if_fc(job.to_score())
+
+def calculate_ppv2_if_fc_batch(jobs: List[PerformanceJob]) -> List[float | None]:
+    """Calculate the if-FC pp of many scores, resolving every beatmap only once"""
+    groups: Dict[int, List[Tuple[int, PerformanceJob]]] = defaultdict(list)
+    results: List[float | None] = [None] * len(jobs)
+
+    for index, job in enumerate(jobs):
+        groups[job.beatmap_id].append((index, job))
+
+    for group in groups.values():
+        if not resolve_beatmap_file(group[0][1]):
+            continue
+
+        for index, job in group:
+            results[index] = performance.calculate_ppv2_if_fc(job.to_score())
+
+    return results
+
+def calculate_ppv2_sweep(job: PerformanceJob, points: List[Tuple[float, int, int]]) -> List[float | None]:
+    """Calculate the pp of one score for every (accuracy, misses, combo) point"""
+    if not resolve_beatmap_file(job):
+        return [None] * len(points)
+
+    # Only the beatmap file is shared between the points: calculate_ppv2 of
+    # common only accepts a score, so every point parses the beatmap & derives
+    # its difficulty again, and a sweep costs as much as one /simulate per point
+    return [
+        performance.calculate_ppv2(
+            replace(job, acc=acc, nMiss=misses, max_combo=combo).to_score()
+        )
+        for acc, misses, combo in points
+    ]
+
+def calculate_mod_comparison(
+    job: PerformanceJob,
+    mods_list: List[int],
+    cached: Dict[int, Any] | None = None
+) -> List[Tuple[int, Any, float | None]]:
+    """Calculate the difficulty & pp of one score for every mod combination"""
+    if not (beatmap_file := resolve_beatmap_file(job)):
+        return [(mods, None, None) for mods in mods_list]
+
+    attributes = dict(cached or {})
+    results = []
+
+    for mods in mods_list:
+        # Mods with the same difficulty share their attributes, and masks
+        # that are already inside the difficulty cache are not calculated again.
+        # The pp still has to be calculated from the score alone, since
+        # calculate_ppv2 of common doesn't accept precomputed attributes.
+        if (mask := difficulty_mods(mods, job.mode)) not in attributes:
+            attributes[mask] = performance.calculate_difficulty(
+                beatmap_file,
+                job.mode,
+                Mods(mods)
+            )
+
+        pp = performance.calculate_ppv2(replace(job, mods=mods).to_score())
+        results.append((mods, attributes[mask], pp))
+
+    return results
+
+class PerformanceEngine:
+    """Runs difficulty & pp calculations inside a pool of worker processes"""
+
+    def __init__(
+        self,
+        workers: int,
+        cache_size: int,
+        difficulty_cache: DifficultyCache | None = None
+    ) -> None:
+        self.logger = logging.getLogger('performance')
+        self.executor: ProcessPoolExecutor | None = None
+        self.difficulty_cache = difficulty_cache
+        self.coalescer = RequestCoalescer()
+        self.cache_size = cache_size
+        self.workers = workers
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=initialize_worker,
+                initargs=(self.cache_size,)
+            )
+
+        return self.executor
+
+    async def submit(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(self.pool, func, *args)
+        except BrokenProcessPool:
+            # A worker died, e.g. inside the native calculator
+            self.logger.error('Performance worker pool broke, restarting...')
+            self.shutdown()
+            raise
+
+    async def difficulty(
+        self,
+        beatmap_id: int,
+        beatmap_md5: str | None,
+        mode: int,
+        mods: int = 0,
+        beatmap_file: bytes | None = None
+    ) -> ppv2.DifficultyAttributes | None:
+        job = PerformanceJob(
+            beatmap_id=beatmap_id,
+            beatmap_md5=beatmap_md5,
+            mode=mode,
+            mods=int(mods),
+            beatmap_file=beatmap_file
+        )
+
+        if self.difficulty_cache is None or beatmap_md5 is None:
+            return await self.submit(calculate_difficulty, job)
+
+        if (attributes := await self.difficulty_cache.get(beatmap_md5, mode, mods)) is not None:
+            return attributes
+
+        key = (beatmap_md5, mode, difficulty_mods(mods, mode))
+        return await self.coalescer.run(key, lambda: self.calculate_difficulty(job))
+
+    async def calculate_difficulty(self, job: PerformanceJob) -> ppv2.DifficultyAttributes | None:
+        if (attributes := await self.submit(calculate_difficulty, job)) is not None:
+            await self.difficulty_cache.set(job.beatmap_md5, job.mode, job.mods, attributes)
+
+        return attributes
+
+    async def invalidate(self, beatmap_md5: str | None) -> None:
+        """Forget the difficulty attributes of a replaced .osu file"""
+        if self.difficulty_cache is not None:
+            await self.difficulty_cache.invalidate(beatmap_md5)
+
+    async def ppv2(self, score: DBScore | Score, beatmap_file: bytes | None = None) -> float | None:
+        return await self.submit(calculate_ppv2, PerformanceJob.from_score(score, beatmap_file))
+
+    async def ppv2_if_fc(self, score: DBScore | Score, beatmap_file: bytes | None = None) -> float | None:
+        return await self.submit(calculate_ppv2_if_fc, PerformanceJob.from_score(score, beatmap_file))
+
+    async def ppv2_if_fc_batch(
+        self,
+        scores: List[DBScore | Score],
+        beatmap_files: Dict[int, bytes | None] | None = None
+    ) -> List[float | None]:
+        beatmap_files = dict(beatmap_files or {})
+        jobs = [
+            # Every file is only sent to the worker once
+            PerformanceJob.from_score(score, beatmap_files.pop(score.beatmap_id, None))
+            for score in scores
+        ]
+        return await self.submit(calculate_ppv2_if_fc_batch, jobs)
+
+    async def ppv2_sweep(
+        self,
+        score: DBScore | Score,
+        points: List[Tuple[float, int, int]],
+        beatmap_file: bytes | None = None
+    ) -> List[float | None]:
+        job = PerformanceJob.from_score(score, beatmap_file)
+        return await self.submit(calculate_ppv2_sweep, job, points)
+
+    async def compare_mods(
+        self,
+        score: DBScore | Score,
+        mods_list: List[int],
+        beatmap_file: bytes | None = None
+    ) -> List[Tuple[int, float | None, float | None]]:
+        """Star rating & pp of a score for every mod combination, as (mods, star rating, pp)"""
+        md5 = score.beatmap.md5
+        cache = self.difficulty_cache if md5 is not None else None
+
+        if cache and (results := await cache.comparison(md5, score.mode)) is not None:
+            return results
+
+        cached = {}
+
+        if cache:
+            masks = {difficulty_mods(mods, score.mode) for mods in mods_list}
+            lookups = await asyncio.gather(*(cache.get(md5, score.mode, mask) for mask in masks))
+            cached = {
+                mask: attributes
+                for mask, attributes in zip(masks, lookups)
+                if attributes is not None
+            }
+
+        job = PerformanceJob.from_score(score, beatmap_file)
+        comparison = await self.submit(calculate_mod_comparison, job, mods_list, cached)
+        results = [
+            (mods, attributes.star_rating if attributes else None, pp)
+            for mods, attributes, pp in comparison
+        ]
+
+        if not cache or any(pp is None for _, _, pp in results):
+            return results
+
+        # Every newly calculated combination also fills the shared difficulty cache
+        calculated = {
+            difficulty_mods(mods, score.mode): (mods, attributes)
+            for mods, attributes, _ in comparison
+            if attributes is not None
+            and difficulty_mods(mods, score.mode) not in cached
+        }
+        await asyncio.gather(
+            cache.set_comparison(md5, score.mode, results),
+            *(
+                cache.set(md5, score.mode, mods, attributes)
+                for mods, attributes in calculated.values()
+            )
+        )
+        return results
+
+    def shutdown(self) -> None:
+        if self.executor is None:
+            return
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
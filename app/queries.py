@@ -0,0 +1,79 @@
+
+from app.common.database.objects import DBScore, DBBeatmap, DBUser
+from app.common.database.repositories import scores
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, Iterable, List
+
+from .snapshots import Score, Beatmap
+
+# Score queries, that load the beatmap, beatmapset & user of every score
+# with one follow-up query each, instead of one lazy load per score, and
+# return them as snapshots that can be used after the session is closed
+
+def preload_beatmaps(beatmap_ids: Iterable[int], session: Session) -> List[DBBeatmap]:
+    if not (beatmap_ids := set(beatmap_ids)):
+        return []
+
+    return session.query(DBBeatmap) \
+        .options(joinedload(DBBeatmap.beatmapset)) \
+        .filter(DBBeatmap.id.in_(beatmap_ids)) \
+        .all()
+
+def preload_users(user_ids: Iterable[int], session: Session) -> List[DBUser]:
+    if not (user_ids := set(user_ids)):
+        return []
+
+    return session.query(DBUser) \
+        .filter(DBUser.id.in_(user_ids)) \
+        .all()
+
+def preload_scores(score_list: List[DBScore], session: Session, users: bool = False) -> List[DBScore]:
+    """Load the relationships of all scores into the session's identity map
+
+    Many-to-one relationships are resolved from the identity map, so
+    accessing `score.beatmap` afterwards doesn't emit another query.
+    """
+    # The identity map only holds weak references, so these have to stay
+    # referenced until every score has resolved its relationships
+    beatmaps = preload_beatmaps((score.beatmap_id for score in score_list), session)
+    user_list = preload_users((score.user_id for score in score_list), session) if users else []
+
+    for score in score_list:
+        # Resolve the relationships while the session is still open
+        score.beatmap.beatmapset
+
+        if users:
+            score.user
+
+    return score_list
+
+def snapshot_scores(score_list: List[DBScore], session: Session, users: bool = False) -> List[Score]:
+    beatmaps: Dict[int, Beatmap] = {}
+    snapshots = []
+
+    for score in preload_scores(score_list, session, users):
+        # Scores on the same beatmap share one snapshot of it
+        if (beatmap := beatmaps.get(score.beatmap_id)) is None:
+            beatmap = beatmaps[score.beatmap_id] = Beatmap.from_db(score.beatmap)
+
+        snapshots.append(Score.from_db(score, users, beatmap))
+
+    return snapshots
+
+def fetch_top_scores(user_id: int, mode: int, limit: int, session: Session) -> List[Score]:
+    return snapshot_scores(
+        scores.fetch_top_scores(user_id, mode, True, limit, 0, session),
+        session
+    )
+
+def fetch_recent_scores(user_id: int, limit: int, session: Session) -> List[Score]:
+    return snapshot_scores(
+        scores.fetch_recent_all(user_id, limit, session),
+        session
+    )
+
+def fetch_pp_record(mode: int, mods: int | None, session: Session) -> Score | None:
+    if not (score := scores.fetch_pp_record(mode, mods, True, session)):
+        return None
+
+    return snapshot_scores([score], session, users=True)[0]
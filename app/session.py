@@ -4,8 +4,17 @@ from .common.helpers.beatmaps import BeatmapResources
 from .common.helpers.filter import ChatFilter
 from .common.cache.events import EventQueue
 from .common.database import Postgres
-from .common.storage import Storage
 from .common.config import Config
+from .subscriptions import Subscriptions
+from .storage import Storage
+from .performance import PerformanceEngine
+from .executors import Executors
+from .settings import Settings
+from .metrics import MetricsServer, Gauge, registry, instrument_engine, instrument_requests
+from .cache import UserCache, BeatmapFileCache, DifficultyCache
+from .http import HttpClient
+from .imports import ImportQueue
+from .index import BeatmapIndex
 
 from redis.asyncio import Redis as RedisAsync
 from discord.ext.commands import Bot
@@ -16,6 +25,7 @@ from redis import Redis
 import logging
 
 config = Config()
+settings = Settings()
 database = Postgres(config)
 storage = Storage(config)
 
@@ -32,6 +42,55 @@ events = EventQueue(
     connection=redis
 )
 beatmaps = BeatmapResources(storage, redis)
+executors = Executors(
+    settings.DATABASE_WORKERS,
+    settings.IO_WORKERS,
+    settings.CPU_WORKERS
+)
+registry.register(Gauge(
+    'banchobot_executor_queue_depth',
+    'Tasks waiting for a free worker in an executor pool',
+    ('pool',),
+    lambda: {
+        (name,): executor.queue_depth
+        for name, executor in executors.pools.items()
+    }
+))
+difficulty_cache = DifficultyCache(
+    redis_async,
+    settings.DIFFICULTY_CACHE_TTL
+)
+performance = PerformanceEngine(
+    settings.PERFORMANCE_WORKERS,
+    settings.PERFORMANCE_CACHE_SIZE,
+    difficulty_cache
+)
+subscriptions = Subscriptions(redis_async)
+user_cache = UserCache(
+    settings.USER_CACHE_TTL,
+    settings.USER_CACHE_SIZE
+)
+beatmap_files = BeatmapFileCache(
+    beatmaps,
+    executors.io,
+    settings.BEATMAP_CACHE_PATH,
+    settings.BEATMAP_CACHE_MEMORY,
+    settings.BEATMAP_CACHE_DISK,
+    settings.BEATMAP_CACHE_COMPRESS
+)
+beatmap_index = BeatmapIndex(
+    database,
+    executors.database
+)
+imports = ImportQueue(
+    redis_async,
+    settings.IMPORT_BATCH_EXPIRY,
+    settings.IMPORT_WORKER_LEASE
+)
+metrics_server = MetricsServer(
+    settings.METRICS_HOST,
+    settings.METRICS_PORT
+)
 
 logger = logging.getLogger('banchobot')
 bot: Optional[Bot] = None
@@ -42,6 +101,18 @@ requests.headers = {
     'User-Agent': f'osuTitanic/banchobot ({config.DOMAIN_NAME})'
 }
 
+http = HttpClient(
+    headers={'User-Agent': f'osuTitanic/banchobot ({config.DOMAIN_NAME})'},
+    timeout=settings.HTTP_TIMEOUT,
+    connections=settings.HTTP_CONNECTIONS,
+    connections_per_host=settings.HTTP_CONNECTIONS_PER_HOST,
+    retries=settings.HTTP_RETRIES,
+    backoff=settings.HTTP_RETRY_BACKOFF
+)
+
+instrument_engine(database.engine)
+instrument_requests(requests)
+
 # Initialize ppv2 calculator
 instance = ppv2_native.NativePerformanceCalculator(beatmaps)
 ppv2.initialize_calculator(instance)
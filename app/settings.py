@@ -0,0 +1,68 @@
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class Settings(BaseSettings):
+    """Bot-specific settings, that are not part of the shared common config"""
+    # Empty values (e.g. "METRICS_PORT=") fall back to the defaults below
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore', env_ignore_empty=True)
+
+    # Thread pool sizes for blocking work
+    DATABASE_WORKERS: int = 8
+    IO_WORKERS: int = 8
+    CPU_WORKERS: int = 2
+
+    # Process pool for difficulty & pp calculations
+    PERFORMANCE_WORKERS: int = 2
+    PERFORMANCE_CACHE_SIZE: int = 128
+
+    # Discord id -> user cache of the chat bridge, changes made outside of the bot show up once it expires
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_SIZE: int = 10000
+
+    # Prometheus metrics endpoint, disabled if no port is set
+    METRICS_HOST: str = '127.0.0.1'
+    METRICS_PORT: int | None = None
+
+    # .osz rebuilds larger than this are spooled to disk
+    OSZ_SPOOL_SIZE: int = 32 * 1024 * 1024
+
+    # Number of difficulties processed at once by /addset
+    ADDSET_CONCURRENCY: int = 4
+
+    # Shared asyncio http client
+    HTTP_TIMEOUT: float = 10.0
+    HTTP_CONNECTIONS: int = 32
+    HTTP_CONNECTIONS_PER_HOST: int = 8
+    HTTP_RETRIES: int = 3
+    HTTP_RETRY_BACKOFF: float = 0.5
+
+    # Background workers & locks of the beatmapset import queue
+    IMPORT_WORKERS: int = 2
+    IMPORT_WORKER_LEASE: int = 30
+    IMPORT_LOCK_TIMEOUT: int = 60 * 15
+    IMPORT_PROGRESS_INTERVAL: int = 5
+    IMPORT_BATCH_EXPIRY: int = 60 * 60 * 24 * 7
+
+    # Rendered /rankings leaderboards, invalidated by keyspace notifications
+    RANKINGS_CACHE_TTL: int = 30
+    RANKINGS_CACHE_SIZE: int = 256
+
+    # Cached /pprecord results, that expire shortly after new records are set
+    PPRECORD_CACHE_TTL: int = 60
+
+    # Rendered /search results & how many of the next ones are loaded along when paging forward
+    SEARCH_CACHE_TTL: int = 60 * 5
+    SEARCH_CACHE_SIZE: int = 1024
+    SEARCH_PREFETCH: int = 3
+
+    # Seconds between full rebuilds of the search index, which picks up changes made outside of the bot
+    BEATMAP_INDEX_INTERVAL: int = 60 * 15
+
+    # .osu files are cached in memory (compressed) & on the local disk
+    BEATMAP_CACHE_PATH: str = '.cache/beatmaps'
+    BEATMAP_CACHE_MEMORY: int = 64 * 1024 * 1024
+    BEATMAP_CACHE_DISK: int = 1024 * 1024 * 1024
+    BEATMAP_CACHE_COMPRESS: bool = True
+
+    # Difficulty attributes in redis, keyed by beatmap md5, mode & mods
+    DIFFICULTY_CACHE_TTL: int = 60 * 60 * 24 * 7
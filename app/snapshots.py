@@ -0,0 +1,118 @@
+
+from app.common.database.objects import DBScore, DBBeatmap, DBBeatmapset, DBUser
+from dataclasses import dataclass
+from datetime import datetime
+
+# Immutable copies of database objects, holding only the fields that the
+# embeds need. They stay valid after their session is closed, so they can
+# be cached, shared between interactions & sent to worker processes.
+
+@dataclass(frozen=True, slots=True)
+class User:
+    id: int
+    name: str
+    preferred_mode: int
+    avatar_hash: str | None = None
+
+    @classmethod
+    def from_db(cls, user: DBUser) -> "User":
+        return cls(
+            id=user.id,
+            name=user.name,
+            preferred_mode=user.preferred_mode,
+            avatar_hash=user.avatar_hash
+        )
+
+@dataclass(frozen=True, slots=True)
+class Beatmapset:
+    id: int
+    title: str
+    artist: str
+    creator: str
+    last_update: datetime | None
+
+    @classmethod
+    def from_db(cls, beatmapset: DBBeatmapset) -> "Beatmapset":
+        return cls(
+            id=beatmapset.id,
+            title=beatmapset.title,
+            artist=beatmapset.artist,
+            creator=beatmapset.creator,
+            last_update=beatmapset.last_update
+        )
+
+@dataclass(frozen=True, slots=True)
+class Beatmap:
+    id: int
+    set_id: int
+    md5: str | None
+    mode: int
+    version: str
+    full_name: str
+    max_combo: int
+    count_normal: int
+    count_slider: int
+    count_spinner: int
+    beatmapset: Beatmapset
+
+    @classmethod
+    def from_db(cls, beatmap: DBBeatmap) -> "Beatmap":
+        return cls(
+            id=beatmap.id,
+            set_id=beatmap.set_id,
+            md5=beatmap.md5,
+            mode=beatmap.mode,
+            version=beatmap.version,
+            full_name=beatmap.full_name,
+            max_combo=beatmap.max_combo,
+            count_normal=beatmap.count_normal,
+            count_slider=beatmap.count_slider,
+            count_spinner=beatmap.count_spinner,
+            beatmapset=Beatmapset.from_db(beatmap.beatmapset)
+        )
+
+@dataclass(frozen=True, slots=True)
+class Score:
+    id: int
+    user_id: int
+    beatmap_id: int
+    mode: int
+    mods: int
+    acc: float
+    pp: float
+    total_score: int
+    max_combo: int
+    grade: str
+    perfect: bool
+    n300: int
+    n100: int
+    n50: int
+    nMiss: int
+    nGeki: int
+    nKatu: int
+    beatmap: Beatmap
+    user: User | None = None
+
+    @classmethod
+    def from_db(cls, score: DBScore, user: bool = False, beatmap: Beatmap | None = None) -> "Score":
+        return cls(
+            id=score.id,
+            user_id=score.user_id,
+            beatmap_id=score.beatmap_id,
+            mode=score.mode,
+            mods=score.mods,
+            acc=score.acc,
+            pp=score.pp,
+            total_score=score.total_score,
+            max_combo=score.max_combo,
+            grade=score.grade,
+            perfect=score.perfect,
+            n300=score.n300,
+            n100=score.n100,
+            n50=score.n50,
+            nMiss=score.nMiss,
+            nGeki=score.nGeki,
+            nKatu=score.nKatu,
+            beatmap=beatmap or Beatmap.from_db(score.beatmap),
+            user=User.from_db(score.user) if user else None
+        )
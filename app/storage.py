@@ -0,0 +1,62 @@
+
+from app.common.storage import Storage as BaseStorage
+from app.common.config import Config
+from typing import BinaryIO, List
+
+import contextlib
+import shutil
+import os
+
+ChunkSize = 1024 * 1024
+
+class Storage(BaseStorage):
+    """Shared storage, extended with uploads from file-like objects & batched removals"""
+
+    def __init__(self, config: Config) -> None:
+        super().__init__(config)
+        self.config = config
+
+    def upload_osz_stream(self, set_id: int, stream: BinaryIO) -> None:
+        """Upload an .osz from a file-like object, without reading all of it into memory"""
+        self.save_stream(set_id, stream, 'osz')
+
+    def save_stream(self, key: int | str, stream: BinaryIO, bucket: str) -> None:
+        if self.config.S3_ENABLED:
+            # boto3 switches to concurrent multipart uploads for larger files
+            self.s3.upload_fileobj(stream, bucket, str(key))
+            return
+
+        path = self.file_path(key, bucket)
+        temporary_path = f'{path}.tmp'
+
+        try:
+            with open(temporary_path, 'wb') as file:
+                shutil.copyfileobj(stream, file, ChunkSize)
+        except Exception:
+            # Don't mask the original error, if the file was never created
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temporary_path)
+
+            raise
+
+        os.replace(temporary_path, path)
+
+    def remove_beatmap_files(self, beatmap_ids: List[int]) -> None:
+        """Remove many .osu files at once, with a single request on s3"""
+        if not self.config.S3_ENABLED:
+            for beatmap_id in beatmap_ids:
+                self.remove_beatmap_file(beatmap_id)
+            return
+
+        # A single DeleteObjects request can remove up to 1000 keys
+        for index in range(0, len(beatmap_ids), 1000):
+            self.s3.delete_objects(
+                Bucket='beatmaps',
+                Delete={
+                    'Objects': [{'Key': str(beatmap_id)} for beatmap_id in beatmap_ids[index:index + 1000]],
+                    'Quiet': True
+                }
+            )
+
+    def file_path(self, key: int | str, bucket: str) -> str:
+        return os.path.join(self.config.DATA_PATH, bucket, str(key))
@@ -0,0 +1,137 @@
+
+from redis.asyncio import Redis as RedisAsync
+from typing import Callable, Awaitable, Dict, List
+from collections import defaultdict
+
+import inspect
+import logging
+import asyncio
+
+Handler = Callable[[str, bytes], Awaitable[None] | None]
+
+class Subscriptions:
+    """Dispatches redis pub/sub messages to the handlers of our cogs"""
+
+    def __init__(self, redis: RedisAsync) -> None:
+        self.redis = redis
+        self.logger = logging.getLogger('subscriptions')
+        self.channels: Dict[str, List[Handler]] = defaultdict(list)
+        self.patterns: Dict[str, List[Handler]] = defaultdict(list)
+        self.task: asyncio.Task | None = None
+        self.restart_task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self.add(self.channels, channel, handler)
+
+    def psubscribe(self, pattern: str, handler: Handler) -> None:
+        self.add(self.patterns, pattern, handler)
+
+    def unsubscribe(self, channel: str, handler: Handler) -> None:
+        self.remove(self.channels, channel, handler)
+
+    def punsubscribe(self, pattern: str, handler: Handler) -> None:
+        self.remove(self.patterns, pattern, handler)
+
+    def add(self, handlers: Dict[str, List[Handler]], name: str, handler: Handler) -> None:
+        subscribed = name in handlers
+        handlers[name].append(handler)
+
+        if not subscribed:
+            self.restart()
+
+    def remove(self, handlers: Dict[str, List[Handler]], name: str, handler: Handler) -> None:
+        if handler not in handlers.get(name, []):
+            return
+
+        handlers[name].remove(handler)
+
+        if not handlers[name]:
+            del handlers[name]
+            self.restart()
+
+    def restart(self) -> None:
+        """Reconnect a running listener, so that it picks up changed channels"""
+        if not self.running:
+            return
+
+        if self.restart_task is not None and not self.restart_task.done():
+            # Changes made until then are picked up by the pending restart
+            return
+
+        self.restart_task = asyncio.create_task(self.reconnect())
+
+    async def reconnect(self) -> None:
+        await self.stop()
+        self.start()
+
+    def start(self) -> None:
+        if self.running:
+            return
+
+        if not self.channels and not self.patterns:
+            return
+
+        self.task = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        if (
+            self.restart_task is not None and
+            self.restart_task is not asyncio.current_task()
+        ):
+            self.restart_task.cancel()
+
+        if not self.running:
+            return
+
+        self.task.cancel()
+
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    async def listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    if self.channels:
+                        await pubsub.subscribe(*self.channels)
+
+                    if self.patterns:
+                        await pubsub.psubscribe(*self.patterns)
+
+                    async for message in pubsub.listen():
+                        await self.dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f'Lost connection to pub/sub, reconnecting: {e}')
+                await asyncio.sleep(5)
+
+    async def dispatch(self, message: dict) -> None:
+        channel = message['channel'].decode()
+
+        if message['type'] == 'message':
+            handlers = self.channels.get(channel, [])
+
+        elif message['type'] == 'pmessage':
+            handlers = self.patterns.get(message['pattern'].decode(), [])
+
+        else:
+            return
+
+        for handler in handlers:
+            try:
+                result = handler(channel, message['data'])
+
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.logger.error(
+                    f'Failed to handle message on "{channel}": {e}',
+                    exc_info=e
+                )
@@ -0,0 +1,296 @@
+
+# Offline benchmarks for the beatmap patch pipeline (parse -> patch -> pack)
+#
+# Usage:
+#   python -m benchmarks.beatmaps                  Compare against the baseline
+#   python -m benchmarks.beatmaps --save-baseline  Record a new baseline
+#
+# Exits with a non-zero status code, if any stage got slower or
+# needed more memory than the baseline allows, or if there is no baseline.
+#
+# Timings are stored relative to a fixed calibration workload, that runs on
+# the same host right before the benchmarks, so that a baseline recorded on
+# one machine can be compared against runs on another one (e.g. in CI).
+# Shared hosts still vary by up to ~2x between runs, so timings only fail
+# at 2.5x of the baseline by default. Peak memory is deterministic, and
+# keeps a tight tolerance.
+
+from typing import Callable, Dict, List, Tuple
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.beatmaps.patches import parse_beatmap, pack_beatmap, apply_beatmap_patches
+from app.beatmaps.curves import convert_perfect_curves
+
+import tracemalloc
+import argparse
+import gc
+import random
+import json
+import time
+import sys
+
+BaselinePath = Path(__file__).parent / 'baseline.json'
+
+@dataclass
+class CorpusEntry:
+    name: str
+    circles: int
+    sliders: int
+    perfect_ratio: float
+
+Corpus = (
+    CorpusEntry('small', circles=150, sliders=100, perfect_ratio=0.1),
+    CorpusEntry('marathon', circles=1500, sliders=2500, perfect_ratio=0.2),
+    CorpusEntry('perfect-curves', circles=200, sliders=1500, perfect_ratio=1.0),
+)
+
+def generate_beatmap(entry: CorpusEntry, seed: int = 727) -> bytes:
+    """Generate a deterministic .osu file, that needs all three patches"""
+    rng = random.Random(seed)
+    objects: List[str] = []
+    offset = 1000
+
+    kinds = ['circle'] * entry.circles + ['slider'] * entry.sliders
+    rng.shuffle(kinds)
+
+    for kind in kinds:
+        x, y = rng.randint(32, 480), rng.randint(32, 352)
+        offset += rng.choice((83, 166, 250))
+
+        if kind == 'circle':
+            objects.append(f'{x},{y},{offset},1,0,0:0:0:0:')
+            continue
+
+        if rng.random() < entry.perfect_ratio:
+            # Three non-collinear points on a circle
+            mid = (x + rng.randint(20, 80), y + rng.randint(-80, -20))
+            end = (x + rng.randint(90, 160), y + rng.randint(-20, 20))
+            curve = f'P|{mid[0]}:{mid[1]}|{end[0]}:{end[1]}'
+        else:
+            points = '|'.join(
+                f'{x + rng.randint(-100, 100)}:{y + rng.randint(-100, 100)}'
+                for _ in range(rng.randint(1, 4))
+            )
+            curve = f'B|{points}'
+
+        length = rng.randint(60, 240)
+        objects.append(f'{x},{y},{offset},2,0,{curve},1,{length},0|0,0:0|0:0,0:0:0:0:')
+
+    content = '\n'.join((
+        'osu file format v14',
+        '',
+        '[General]',
+        'AudioFilename: audio.mp3',
+        'AudioLeadIn: 0',
+        'PreviewTime: -1',
+        'Countdown: 0',
+        'SampleSet: Normal',
+        'StackLeniency: 0.7',
+        'Mode: 0',
+        'LetterboxInBreaks: 0',
+        'WidescreenStoryboard: 0',
+        '',
+        '[Editor]',
+        'DistanceSpacing: 1',
+        'BeatDivisor: 4',
+        'GridSize: 4',
+        'TimelineZoom: 1',
+        '',
+        '[Metadata]',
+        f'Title:{entry.name}',
+        f'TitleUnicode:{entry.name}',
+        'Artist:banchobot',
+        'ArtistUnicode:banchobot',
+        'Creator:banchobot',
+        'Version:benchmark',
+        'Source:',
+        'Tags:',
+        'BeatmapID:0',
+        'BeatmapSetID:-1',
+        '',
+        '[Difficulty]',
+        'HPDrainRate:5.5',
+        'CircleSize:4.2',
+        'OverallDifficulty:8.5',
+        'ApproachRate:9.3',
+        'SliderMultiplier:1.4',
+        'SliderTickRate:1',
+        '',
+        '[Events]',
+        '//Background and Video events',
+        '//Break Periods',
+        '',
+        '[TimingPoints]',
+        '0,333.333333333333,4,2,0,60,1,0',
+        '',
+        '[HitObjects]',
+        *objects,
+        ''
+    ))
+    return content.encode('utf-8')
+
+def measure(func: Callable, setup: Callable, iterations: int) -> Tuple[float, int]:
+    """Return the fastest time & peak memory of `func`, given a fresh `setup()` value
+
+    The fastest run is the least affected by other processes on the host.
+    Like timeit, garbage collection is disabled while a run is timed, so
+    that collecting the previous runs' objects isn't attributed to it.
+    """
+    timings = []
+
+    for _ in range(iterations):
+        value = setup()
+        gc.collect()
+        gc.disable()
+
+        try:
+            start = time.perf_counter()
+            func(value)
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    value = setup()
+    tracemalloc.start()
+
+    try:
+        func(value)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak_memory
+
+def calibration_workload(_: object) -> None:
+    """Pure python work, similar to parsing: string splitting & float conversion"""
+    lines = [f'{index},{index * 7 % 512},{index * 83},2,0,B|1:2|3:4,1,{index % 240}' for index in range(20000)]
+
+    for line in lines:
+        values = line.split(',')
+        float(values[0]) + float(values[1]) * float(values[2])
+
+def calibrate(iterations: int) -> float:
+    """Fastest time of the calibration workload on this host"""
+    seconds, _ = measure(calibration_workload, lambda: None, iterations)
+    return seconds
+
+def run_benchmarks(iterations: int) -> Dict[str, Dict[str, dict]]:
+    calibration = calibrate(iterations)
+    results = {}
+
+    for entry in Corpus:
+        content = generate_beatmap(entry)
+
+        def parse() -> object:
+            return parse_beatmap(content, 0)
+
+        def patched() -> object:
+            beatmap = parse()
+            apply_beatmap_patches(beatmap)
+            return beatmap
+
+        stages = {
+            'parse': measure(lambda _: parse(), lambda: None, iterations),
+            'patch': measure(apply_beatmap_patches, parse, iterations),
+            'pack': measure(pack_beatmap, patched, iterations)
+        }
+        results[entry.name] = {
+            stage: {
+                'seconds': seconds,
+                'relative_time': seconds / calibration,
+                'peak_memory': peak_memory
+            }
+            for stage, (seconds, peak_memory) in stages.items()
+        }
+
+    return results
+
+def check_curve_equivalence() -> List[str]:
+    """Ensure that the batched perfect-curve conversion matches the scalar reference"""
+    mismatches = []
+
+    for entry in Corpus:
+        content = generate_beatmap(entry)
+        scalar = parse_beatmap(content, 0)
+        batched = parse_beatmap(content, 0)
+        convert_perfect_curves(scalar, vectorized=False)
+        convert_perfect_curves(batched, vectorized=True)
+
+        if pack_beatmap(scalar) != pack_beatmap(batched):
+            mismatches.append(f'{entry.name}: batched perfect curves differ from the scalar path')
+
+    return mismatches
+
+def compare(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> List[str]:
+    regressions = []
+
+    for corpus_name, stages in results.items():
+        for stage, result in stages.items():
+            if not (expected := baseline.get(corpus_name, {}).get(stage)):
+                continue
+
+            # Absolute seconds depend on the host, only the relative time is compared
+            for metric, tolerance in (('relative_time', time_tolerance), ('peak_memory', memory_tolerance)):
+                limit = expected[metric] * (1 + tolerance)
+
+                if result[metric] > limit:
+                    regressions.append(
+                        f'{corpus_name}/{stage}: {metric} {result[metric]:.6g} '
+                        f'exceeds baseline {expected[metric]:.6g} (+{tolerance:.0%})'
+                    )
+
+    return regressions
+
+def print_results(results: dict, baseline: dict) -> None:
+    print(f'{"corpus":<16}{"stage":<8}{"time (ms)":>12}{"relative":>12}{"baseline":>12}{"peak (KiB)":>14}{"baseline":>12}')
+
+    for corpus_name, stages in results.items():
+        for stage, result in stages.items():
+            expected = baseline.get(corpus_name, {}).get(stage, {})
+            expected_time = f'{expected["relative_time"]:.3f}' if expected else '-'
+            expected_memory = f'{expected["peak_memory"] / 1024:.0f}' if expected else '-'
+            print(
+                f'{corpus_name:<16}{stage:<8}'
+                f'{result["seconds"] * 1000:>12.2f}{result["relative_time"]:>12.3f}{expected_time:>12}'
+                f'{result["peak_memory"] / 1024:>14.0f}{expected_memory:>12}'
+            )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the beatmap patch pipeline')
+    parser.add_argument('--iterations', type=int, default=7)
+    parser.add_argument('--tolerance', type=float, default=1.5, help='Allowed time regression, e.g. 1.5 for 150%%')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='Allowed memory regression')
+    parser.add_argument('--baseline', type=Path, default=BaselinePath)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    if mismatches := check_curve_equivalence():
+        print('\n'.join(mismatches))
+        return 1
+
+    results = run_benchmarks(args.iterations)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=4) + '\n')
+        print_results(results, results)
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+
+    if not args.baseline.exists():
+        print_results(results, {})
+        print(f'No baseline found at {args.baseline}, use --save-baseline to create one')
+        return 1
+
+    baseline = json.loads(args.baseline.read_text())
+    print_results(results, baseline)
+
+    if regressions := compare(results, baseline, args.tolerance, args.memory_tolerance):
+        print('\nRegressions:')
+        print('\n'.join(f'  - {regression}' for regression in regressions))
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
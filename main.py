@@ -1,9 +1,7 @@
 
 from app.common.logging import Console, File
-from app.session import config
 
 import logging
-import app
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,7 +10,12 @@ logging.basicConfig(
 )
 
 def main():
-    if not config.ENABLE_DISCORD_BOT or not config.DISCORD_BOT_TOKEN:
+    # pp workers are spawned & re-import this module as "__mp_main__",
+    # so the session and all cogs may only be loaded from here
+    import app.session
+    import app.bot
+
+    if not app.session.config.ENABLE_DISCORD_BOT or not app.session.config.DISCORD_BOT_TOKEN:
         logging.warning("BanchoBot is disabled, exiting...")
         exit(0)
 